@@ -2,23 +2,51 @@
 Flask Web Server for Smart Tourist Safety System
 Real-time person detection with DUAL CAMERA support
 """
-from flask import Flask, render_template, Response, jsonify, request
+import os
+
+# "threading" (Werkzeug dev server), "eventlet" or "gevent" (green MJPEG/websocket I/O).
+# Only sockets/select are patched: the camera pipelines and the inference
+# worker must stay on real OS threads so they run while clients stream.
+ASYNC_MODE = os.environ.get("ASYNC_MODE", "threading")
+if ASYNC_MODE == "eventlet":
+    import eventlet
+    import eventlet.tpool
+    eventlet.monkey_patch(thread=False, time=False)
+elif ASYNC_MODE == "gevent":
+    import gevent
+    from gevent import monkey
+    monkey.patch_all(thread=False, time=False, queue=False, signal=False)
+
+from flask import Flask, render_template, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import cv2
+import numpy as np
 import time
 from loguru import logger
 import sys
 import threading
 import json
 import base64
+import uuid
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
 
 # Local imports
 sys.path.append('../')
 from core.tracker import ByteTrack
+from core import _iou_numba
 from core.detector import PersonDetector
+from core.pipeline import InferenceWorker, CameraPipeline
+from core.mosaic import MosaicStream
 from utils.video_reader import VideoReader
+from utils.video_encoder import VideoEncoder
+from utils.hls_streamer import HLSStreamer
+from utils import fast_json
+from utils.rate_limited_logger import RateLimitedLogger
 from database.utils import generate_did, generate_feature_id, compute_id_hash
 from database.db_manager import DatabaseManager
 from database.mongo_manager import MongoManager
@@ -29,36 +57,140 @@ from database.mongo_manager import MongoManager
 logger.remove()
 logger.add(sys.stdout, colorize=True,
            format="<green>{time:HH:mm:ss}</green> | <level>{level}</level> | {message}")
-logger.add("logs/app.log", rotation="10 MB")
+# enqueue: file writes happen on loguru's background thread, never on a frame loop
+logger.add("logs/app.log", rotation="10 MB", enqueue=True)
 
 # ----------------------------------------------------
 # FLASK APP
 # ----------------------------------------------------
 app = Flask(__name__)
+# templates never change while the server runs; let browsers cache static files for a day
+app.config["TEMPLATES_AUTO_RELOAD"] = False
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 86400
 CORS(app)
-# using thread async mode (eventlet/gevent optional)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# async mode comes from ASYNC_MODE (threading by default, eventlet or gevent for production)
+# payloads are serialized with orjson (falls back to stdlib json)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE, json=fast_json)
 
 # ----------------------------------------------------
 # GLOBALS
 # ----------------------------------------------------
 detector = None
+inference_worker = None  # batches frames from both cameras into one forward pass
 
-video_reader_1 = None
-video_reader_2 = None
+# display/stream resolution, requested from the capture device where possible
+FRAME_SIZE = (640, 480)
 
-is_running_1 = False
-is_running_2 = False
+CAMERA_IDS = (1, 2)
 
-# Keep trackers as globals but don't depend on them to always exist while generator runs.
-tracker_1 = None
-tracker_2 = None
+# H.264 HLS output (alternative to MJPEG), one folder per camera
+HLS_DIR = "hls"
+HLS_FPS = 25
+hls_lock = threading.Lock()  # guards CameraContext.hls start/stop
 
+# per-camera detection buffer: at most this many tracks are reported in the stats
+MAX_REPORTED_TRACKS = 256
+# buffer columns: id, x1, y1, x2, y2, conf
+DET_COLUMNS = ("id", "x1", "y1", "x2", "y2", "conf")
+
+
+def tracks_to_soa(rows):
+    """
+    Detection buffer rows (N x 6, see DET_COLUMNS) as parallel lists for the stats payload.
+    The dashboard zips them back into rows; no per-detection dict is built or sent.
+    """
+    return {
+        "ids": rows[:, 0].astype(int).tolist(),
+        "x1": rows[:, 1].astype(int).tolist(),
+        "y1": rows[:, 2].astype(int).tolist(),
+        "x2": rows[:, 3].astype(int).tolist(),
+        "y2": rows[:, 4].astype(int).tolist(),
+        "confs": rows[:, 5].astype(float).round(3).tolist(),
+    }
+
+
+def camera_stats(fps, rows):
+    """Stats payload for one camera from an (N x 6) detection snapshot"""
+    return {"fps": round(fps, 1), "persons": len(rows), "detections": tracks_to_soa(rows)}
+
+# MJPEG multipart framing around each JPEG.
+# Content-Length lets clients read each part by size instead of scanning for the boundary.
+BOUNDARY_HEAD = b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n"
+BOUNDARY_TAIL = b"\r\n"
+
+# mosaic stream: with cameras running but no new frame, resend the last one after this many
+# 1 s waits (a client that left then surfaces as a failed write); with no camera running,
+# end the stream after this many
+MOSAIC_KEEPALIVE_WAITS = 5
+MOSAIC_IDLE_WAITS = 10
+
+# framed part of the newest frame per stream source (pipeline or mosaic) as (seq, bytes),
+# built once per frame and shared by every viewer of that source
+mjpeg_parts = weakref.WeakKeyDictionary()
+mjpeg_parts_lock = threading.Lock()
+
+
+@dataclass
+class CameraContext:
+    """Everything one camera slot owns"""
+    cam_id: int
+    reader: VideoReader = None
+    pipeline: CameraPipeline = None  # capture -> infer -> draw -> encode (owns its tracker)
+    hls: HLSStreamer = None  # started by the first /hls request, stopped with the camera
+    # latest tracks, written in place by the pipeline thread (guarded by stats_lock)
+    fps: float = 0.0
+    det_buf: np.ndarray = field(
+        default_factory=lambda: np.zeros((MAX_REPORTED_TRACKS, len(DET_COLUMNS)), dtype=np.float32))
+    det_n: int = 0
+
+    @property
+    def running(self):
+        return bool(self.pipeline and self.pipeline.running)
+
+    def store(self, fps, tracked):
+        """Copy a track array (ByteTrack.update) into the detection buffer; caller holds stats_lock"""
+        n = min(len(tracked), MAX_REPORTED_TRACKS) if tracked is not None else 0
+        if n:
+            for col, name in enumerate(DET_COLUMNS):
+                self.det_buf[:n, col] = tracked[name][:n]
+        self.det_n = n
+        self.fps = fps
+
+    def snapshot(self):
+        """(fps, rows copy) of the latest result; caller holds stats_lock"""
+        return self.fps, self.det_buf[:self.det_n].copy()
+
+
+cameras = {cam: CameraContext(cam) for cam in CAMERA_IDS}
+
+# every camera side by side in one JPEG (/video_feed_combined), own encoder
+mosaic = MosaicStream(CAMERA_IDS, FRAME_SIZE, VideoEncoder(quality=70),
+                      lambda cam: cameras[cam].pipeline)
+
+# last combined snapshot (built by update_combined_stats, read by the API)
 current_stats = {
-    'camera1': {'fps': 0, 'persons': 0, 'detections': []},
-    'camera2': {'fps': 0, 'persons': 0, 'detections': []},
+    **{f'camera{cam}': camera_stats(*ctx.snapshot()) for cam, ctx in cameras.items()},
     'total_persons': 0
 }
+# written by the pipeline threads, read by the stats emitter / API
+stats_lock = threading.Lock()
+# per-frame / per-emit error paths log one traceback per key every 5 s
+sampled_errors = RateLimitedLogger(interval=5.0)
+STATS_INTERVAL = 0.2  # seconds between socketio "stats" emits (5 Hz)
+# set when any camera's stats changed since the last emit
+stats_dirty = threading.Event()
+
+# changes below these are not worth a websocket message
+FPS_EPSILON = 0.5  # frames per second
+BOX_EPSILON = 2.0  # pixels, per box coordinate
+# camera id -> (fps, rows) last sent to the dashboard
+last_emitted = {}
+
+# /api/status body: counters only (detections go over socket.io), cached as
+# JSON bytes and rebuilt when the stats or a camera's running state change
+status_small = {f'camera{cam}': {'fps': 0, 'persons': 0} for cam in CAMERA_IDS}
+stats_version = 0
+status_cache = {'entry': (None, b'')}  # (key, body), swapped as one tuple
 
 # ----------------------------------------------------
 # DATABASE INITIALIZATION
@@ -79,241 +211,259 @@ except Exception as e:
     mongo_manager = None
 
 # ----------------------------------------------------
-# HELPERS
+# PERSISTENCE WORKERS
+# registration writes (AES-GCM + SQLite commit + Mongo insert) run on this
+# pool, off the request threads (SQLite writes still serialize on its lock)
 # ----------------------------------------------------
-def safe_create_local_tracker(global_tracker, **kwargs):
+persist_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="Persist")
+
+# job id -> Future of a queued registration, polled via /api/register_status/<job>
+MAX_ENROLL_JOBS = 1000
+enroll_jobs = OrderedDict()
+enroll_jobs_lock = threading.Lock()
+
+
+def persist_registration(tourist_data, feature_data):
     """
-    Return a tracker instance to use in the generator loop.
-    If a global tracker exists, use it. Otherwise create a temporary local one.
-    This prevents race conditions where the global is set to None while generator is running.
+    Write one registration (runs on persist_pool)
+
+    Returns:
+        SQLite row id of the tourist
     """
-    if global_tracker is not None:
-        return global_tracker, False  # (tracker_to_use, is_local_flag)
-    else:
-        return ByteTrack(**kwargs), True
+    try:
+        tourist_id, _ = db_manager.register_tourist(tourist_data)
 
-# ----------------------------------------------------
-# CAMERA STREAM FUNCTIONS (robust & defensive)
-# ----------------------------------------------------
-def generate_frames_camera1():
-    global detector, video_reader_1, is_running_1, tracker_1, current_stats
+        if feature_data and mongo_manager:
+            mongo_manager.store_tourist_features(feature_data)
+    except Exception as e:
+        logger.exception("Failed to persist registration for {}: {}", tourist_data.get("did"), e)
+        raise
 
-    if not video_reader_1:
-        logger.error("Camera 1 not initialized")
-        # Return a small generator that yields nothing
-        if False:
-            yield b''
-        return
+    return tourist_id
 
-    frame_count = 0
-    start_time = time.time()
-    process_every = 2
-    last_tracked = []
 
-    # Use a local tracker if global is None to avoid AttributeError when global cleared.
-    # But prefer global so state (IDs) is maintained.
-    while is_running_1:
-        try:
-            ret, frame = video_reader_1.read()
-            if not ret or frame is None:
-                logger.info("Camera 1 read returned no frame, stopping generator")
-                # gracefully end stream
-                is_running_1 = False
-                break
+def submit_registration(tourist_data, feature_data):
+    """Queue a registration write and return its job id"""
+    job_id = uuid.uuid4().hex[:12]
+    future = persist_pool.submit(persist_registration, tourist_data, feature_data)
 
-            frame_count += 1
-            resized = cv2.resize(frame, (640, 480))
+    with enroll_jobs_lock:
+        enroll_jobs[job_id] = future
+        # forget the oldest jobs; their rows are in the database either way
+        while len(enroll_jobs) > MAX_ENROLL_JOBS:
+            enroll_jobs.popitem(last=False)
 
-            # get tracker safely
-            t, is_local = safe_create_local_tracker(tracker_1, max_age=30, min_hits=3, iou_threshold=0.3)
+    return job_id
 
-            if frame_count % process_every == 0:
-                # ensure detector exists
-                if detector is None:
-                    detections = []
-                else:
-                    detections = detector.detect(resized)
+# ----------------------------------------------------
+# CAMERA STREAM FUNCTIONS (robust & defensive)
+# ----------------------------------------------------
+def on_camera_result(cam, fps, tracked):
+    """
+    Pipeline callback: record per-camera results after each tracked frame.
+    Only copies into the camera's preallocated buffer; the payload lists are
+    built by the stats emitter at STATS_INTERVAL, not once per frame.
+    """
+    with stats_lock:
+        cameras[cam].store(fps, tracked)
+    stats_dirty.set()
 
-                # update tracking (guarded)
-                try:
-                    tracked = t.update(detections)
-                except Exception as e:
-                    logger.exception("Tracker update failed (camera1): {}", e)
-                    tracked = last_tracked
 
-                last_tracked = tracked
-            else:
-                tracked = last_tracked
+def next_jpeg(pipeline, last_seq, timeout=1.0):
+    """
+    Wait for an encoded frame newer than last_seq (from a CameraPipeline or the mosaic).
+    Under eventlet/gevent the slot is polled with socketio.sleep so a waiting
+    client never blocks the hub that serves every other client.
 
-            # If tracker used was local (temporary), we drop it (do not assign back)
-            if not is_local:
-                # global tracker_1 remains as-is
-                pass
+    Returns:
+        (seq, jpeg); jpeg is None on timeout
+    """
+    if ASYNC_MODE == "threading":
+        seq, jpeg = pipeline.wait_frame(last_seq, timeout)
+    else:
+        deadline = time.monotonic() + timeout
+        seq, jpeg = pipeline.latest_frame()
+        while seq == last_seq and time.monotonic() < deadline:
+            socketio.sleep(0.005)
+            seq, jpeg = pipeline.latest_frame()
 
-            # Draw detections (detector handles drawing)
-            if detector:
-                resized = detector.draw_tracked_detections(resized, tracked)
+    if seq == last_seq:
+        return last_seq, None
+    return seq, jpeg
 
-            # compute fps safely
-            elapsed = max(1e-6, time.time() - start_time)
-            fps = frame_count / elapsed
 
-            # update stats
-            current_stats["camera1"] = {
-                "fps": round(fps, 1),
-                "persons": len(tracked) if tracked is not None else 0,
-                "detections": tracked or []
-            }
+def mjpeg_part(source, seq, jpeg):
+    """
+    Boundary + headers + JPEG + CRLF as a single buffer, so each frame is one
+    socket write instead of three. Built by the first viewer to see seq; the
+    others reuse it, so the copy is paid once per frame, not once per viewer.
+    """
+    with mjpeg_parts_lock:
+        cached = mjpeg_parts.get(source)
+    if cached is not None and cached[0] == seq:
+        return cached[1]
 
-            # emit combined stats periodically (every 5 frames)
-            if frame_count % 5 == 0:
-                update_combined_stats()
+    part = b"".join((BOUNDARY_HEAD % len(jpeg), jpeg, BOUNDARY_TAIL))
+    with mjpeg_parts_lock:
+        mjpeg_parts[source] = (seq, part)
+    return part
 
-            ret2, buffer = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, 70])
-            if not ret2:
-                logger.warning("Failed to encode frame for camera1")
-                continue
 
-            yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" +
-                   buffer.tobytes() + b"\r\n")
+def generate_combined():
+    """MJPEG parts of the side-by-side mosaic of every camera"""
+    mosaic.add_viewer()
+    last_seq = mosaic.latest_frame()[0]
+    last_part = None
+    waits = 0
 
-        except GeneratorExit:
-            # client disconnected, break
-            logger.info("GeneratorExit in camera1 generator - client disconnected")
-            break
-        except Exception as e:
-            logger.exception("Unhandled exception in generate_frames_camera1: {}", e)
-            # avoid tight error loop — sleep slightly
-            time.sleep(0.1)
-            # continue loop or break — better to break to let client reconnect cleanly
-            break
-
-    # cleanup local resources if any
     try:
-        if video_reader_1:
-            # don't release video_reader here if other threads rely on it; caller stop_camera handles release
-            pass
-    except Exception:
-        pass
+        while True:
+            last_seq, jpeg = next_jpeg(mosaic, last_seq)
+            if jpeg is None:
+                waits += 1
+                if not any(ctx.running for ctx in cameras.values()):
+                    if waits >= MOSAIC_IDLE_WAITS:
+                        logger.info("No camera running, ending mosaic stream")
+                        break
+                elif last_part is not None and waits % MOSAIC_KEEPALIVE_WAITS == 0:
+                    yield last_part
+                continue
 
+            waits = 0
+            last_part = mjpeg_part(mosaic, last_seq, jpeg)
+            yield last_part
+    finally:
+        # the last viewer leaving unhooks the mosaic from the pipelines
+        mosaic.remove_viewer()
 
-def generate_frames_camera2():
-    global detector, video_reader_2, is_running_2, tracker_2, current_stats
 
-    if not video_reader_2:
-        logger.error("Camera 2 not initialized")
+def generate_frames(cam):
+    """
+    Stream pre-encoded JPEGs from a camera's pipeline as MJPEG parts.
+    All capture/inference/encode work happens on the pipeline threads;
+    every viewer gets every new frame (slow viewers skip to the newest).
+    """
+    pipeline = cameras[cam].pipeline
+    if not pipeline:
+        logger.error(f"Camera {cam} not initialized")
+        # Return a small generator that yields nothing
         if False:
             yield b''
         return
 
-    frame_count = 0
-    start_time = time.time()
-    process_every = 2
-    last_tracked = []
+    pipeline.add_subscriber()
+    last_seq = pipeline.latest_frame()[0]
 
-    while is_running_2:
-        try:
-            ret, frame = video_reader_2.read()
-            if not ret or frame is None:
-                logger.info("Camera 2 read returned no frame, stopping generator")
-                is_running_2 = False
-                break
-
-            frame_count += 1
-            resized = cv2.resize(frame, (640, 480))
-
-            t, is_local = safe_create_local_tracker(tracker_2, max_age=30, min_hits=3, iou_threshold=0.3)
-
-            if frame_count % process_every == 0:
-                if detector is None:
-                    detections = []
-                else:
-                    detections = detector.detect(resized)
+    try:
+        while pipeline.running:
+            try:
+                last_seq, jpeg = next_jpeg(pipeline, last_seq)
+                if jpeg is None:
+                    continue
 
-                try:
-                    tracked = t.update(detections)
-                except Exception as e:
-                    logger.exception("Tracker update failed (camera2): {}", e)
-                    tracked = last_tracked
+                yield mjpeg_part(pipeline, last_seq, jpeg)
 
-                last_tracked = tracked
-            else:
-                tracked = last_tracked
+            except GeneratorExit:
+                # client disconnected, break
+                logger.info(f"GeneratorExit in camera{cam} generator - client disconnected")
+                break
+            except Exception as e:
+                sampled_errors.exception(f"stream-{cam}", "Unhandled exception in camera{} generator: {}", cam, e)
+                break
+    finally:
+        # lets the pipeline skip draw/encode once the last viewer is gone
+        pipeline.remove_subscriber()
 
-            if detector:
-                resized = detector.draw_tracked_detections(resized, tracked)
 
-            elapsed = max(1e-6, time.time() - start_time)
-            fps = frame_count / elapsed
+# ----------------------------------------------------
+# STATS EMISSION
+# ----------------------------------------------------
+def stats_changed(cam, fps, rows):
+    """True if fps, the track ids or any box moved noticeably since the last emit"""
+    previous = last_emitted.get(cam)
+    if previous is None:
+        return True
 
-            current_stats["camera2"] = {
-                "fps": round(fps, 1),
-                "persons": len(tracked) if tracked is not None else 0,
-                "detections": tracked or []
-            }
+    last_fps, last_rows = previous
+    if abs(fps - last_fps) >= FPS_EPSILON or len(rows) != len(last_rows):
+        return True
+    if not np.array_equal(rows[:, 0], last_rows[:, 0]):
+        return True
+    return np.abs(rows[:, 1:5] - last_rows[:, 1:5]).max(initial=0.0) >= BOX_EPSILON
 
-            if frame_count % 5 == 0:
-                update_combined_stats()
 
-            ret2, buffer = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, 70])
-            if not ret2:
-                logger.warning("Failed to encode frame for camera2")
-                continue
+def update_combined_stats():
+    # copy the buffers under the lock, build the payload outside it
+    with stats_lock:
+        snapshots = {cam: cameras[cam].snapshot() for cam in CAMERA_IDS}
 
-            yield (b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" +
-                   buffer.tobytes() + b"\r\n")
+    # nothing the dashboard would visibly redraw: skip the emit entirely
+    if not any(stats_changed(cam, *snapshot) for cam, snapshot in snapshots.items()):
+        return
+    last_emitted.update(snapshots)
 
-        except GeneratorExit:
-            logger.info("GeneratorExit in camera2 generator - client disconnected")
-            break
-        except Exception as e:
-            logger.exception("Unhandled exception in generate_frames_camera2: {}", e)
-            time.sleep(0.1)
-            break
+    per_camera = {f"camera{cam}": camera_stats(*snapshot) for cam, snapshot in snapshots.items()}
 
-# ----------------------------------------------------
-# STATS EMISSION
-# ----------------------------------------------------
-def update_combined_stats():
     # sum persons safely
     try:
-        total = int(current_stats.get("camera1", {}).get("persons", 0)) + int(current_stats.get("camera2", {}).get("persons", 0))
+        total = sum(int(stats.get("persons", 0)) for stats in per_camera.values())
     except Exception:
         total = 0
-    current_stats["total_persons"] = total
 
-    all_dets = []
+    payload = {**per_camera, "total_persons": total}
 
-    for det in current_stats.get("camera1", {}).get("detections", []) or []:
-        # ensure dict-like
-        try:
-            all_dets.append({**(det or {}), "camera": "Camera 1"})
-        except Exception:
-            all_dets.append({"camera": "Camera 1", "raw": str(det)})
+    global stats_version
+    with stats_lock:
+        current_stats.update(payload)
+        for name, stats in per_camera.items():
+            status_small[name] = {"fps": stats["fps"], "persons": stats["persons"]}
+        stats_version += 1
 
-    for det in current_stats.get("camera2", {}).get("detections", []) or []:
-        try:
-            all_dets.append({**(det or {}), "camera": "Camera 2"})
-        except Exception:
-            all_dets.append({"camera": "Camera 2", "raw": str(det)})
-
-    # emit robust payload
+    # per-camera detections are already flat arrays, emitted as-is
     try:
-        socketio.emit("stats", {
-            "camera1": current_stats.get("camera1", {}),
-            "camera2": current_stats.get("camera2", {}),
-            "total_persons": total,
-            "all_detections": all_dets
-        })
+        socketio.emit("stats", payload)
     except Exception as e:
-        logger.exception("Failed to emit stats via socketio: {}", e)
+        sampled_errors.exception("emit", "Failed to emit stats via socketio: {}", e)
+
+
+def stats_emitter():
+    """Background task: push combined stats to dashboard clients at a fixed rate, only when they changed"""
+    while True:
+        # polled rather than waited on, so the task also yields under eventlet/gevent
+        socketio.sleep(STATS_INTERVAL)
+        if not stats_dirty.is_set():
+            continue
+        stats_dirty.clear()
+        update_combined_stats()
 
 # ----------------------------------------------------
 # ROUTES
 # ----------------------------------------------------
+# pages have no per-request data, so each is rendered once and served from memory
+PAGES = ("index.html", "register.html")
+rendered_pages = {}
+
+
+def render_page(name):
+    html = rendered_pages.get(name)
+    if html is None:
+        html = rendered_pages[name] = render_template(name)
+    return Response(html, mimetype="text/html")
+
+
+def prerender_pages():
+    """Render the static pages at startup so the first visitor doesn't pay for it"""
+    with app.test_request_context():
+        for name in PAGES:
+            try:
+                render_page(name)
+            except Exception as e:
+                logger.exception("Failed to pre-render {}: {}", name, e)
+
+
 @app.route("/")
 def index():
-    return render_template("index.html")
+    return render_page("index.html")
 
 @app.route("/register")
 def register_page():
@@ -321,7 +471,7 @@ def register_page():
     Render tourist registration page.
     """
     try:
-        return render_template("register.html")
+        return render_page("register.html")
     except Exception as e:
         
         logger.exception("Failed to render register page: {}", e)
@@ -329,16 +479,117 @@ def register_page():
 
 
 
-@app.route("/video_feed_1")
-def video_feed_1():
-    return Response(generate_frames_camera1(),
-                    mimetype="multipart/x-mixed-replace; boundary=frame")
+@app.route("/video_feed_<int:cam>")
+def video_feed(cam):
+    """MJPEG stream for any configured camera (/video_feed_1, /video_feed_2, ...)"""
+    if cam not in cameras:
+        return jsonify({"error": f"Unknown camera {cam}"}), 404
+
+    # direct_passthrough: chunks go straight to the server, no per-chunk
+    # encode/iterable wrapping by Werkzeug
+    return Response(generate_frames(cam),
+                    mimetype="multipart/x-mixed-replace; boundary=frame",
+                    direct_passthrough=True)
 
 
-@app.route("/video_feed_2")
-def video_feed_2():
-    return Response(generate_frames_camera2(),
-                    mimetype="multipart/x-mixed-replace; boundary=frame")
+@app.route("/video_feed_combined")
+def video_feed_combined():
+    """MJPEG stream of all cameras tiled left to right, encoded once per update"""
+    return Response(generate_combined(),
+                    mimetype="multipart/x-mixed-replace; boundary=frame",
+                    direct_passthrough=True)
+
+
+def start_hls(ctx):
+    """
+    Attach an HLS encoder to the camera's pipeline (no-op if already running)
+
+    Returns:
+        True if the encoder is running, False if it could not be started
+    """
+    with hls_lock:
+        if ctx.hls is not None:
+            return True
+
+        streamer = HLSStreamer(os.path.join(HLS_DIR, f"camera{ctx.cam_id}"), FRAME_SIZE, fps=HLS_FPS)
+        try:
+            streamer.start()
+        except Exception as e:
+            # e.g. ffmpeg not installed: leave the camera without a streamer so a later request retries
+            logger.exception("Failed to start HLS for camera {}: {}", ctx.cam_id, e)
+            return False
+
+        # only a started streamer is attached; it counts as a viewer, so the pipeline
+        # keeps drawing annotated frames
+        ctx.hls = streamer
+        ctx.pipeline.add_subscriber()
+        ctx.pipeline.frame_sinks.append(streamer.push)
+        return True
+
+
+def stop_hls(ctx):
+    """Detach and stop the camera's HLS encoder, if any"""
+    with hls_lock:
+        streamer, ctx.hls = ctx.hls, None
+
+    if streamer is None:
+        return
+
+    if ctx.pipeline:
+        try:
+            ctx.pipeline.frame_sinks.remove(streamer.push)
+        except ValueError:
+            pass
+        ctx.pipeline.remove_subscriber()
+
+    run_blocking(streamer.stop)
+
+
+@app.route("/hls/<int:cam>/<path:filename>")
+def hls_stream(cam, filename):
+    """
+    H.264 HLS for a running camera: /hls/1/index.m3u8 plus its fMP4 segments.
+    ~10-30x less bandwidth than MJPEG at ~2-4 s of latency.
+    """
+    if cam not in cameras:
+        return jsonify({"error": f"Unknown camera {cam}"}), 404
+
+    ctx = cameras[cam]
+    if not ctx.running:
+        return jsonify({"error": f"Camera {cam} is not running"}), 404
+
+    if filename == HLSStreamer.PLAYLIST and not start_hls(ctx):
+        return jsonify({"error": f"HLS encoder unavailable for camera {cam}"}), 503
+
+    # the playlist shows up once the first segment is written; players retry until then
+    return send_from_directory(os.path.join(HLS_DIR, f"camera{cam}"), filename, max_age=0)
+
+
+def run_blocking(fn, *args):
+    """
+    Run a call that blocks for a long time (thread joins, opening RTSP streams).
+    Under eventlet/gevent it goes to the native thread pool so the hub keeps
+    serving every other stream and websocket meanwhile.
+    """
+    if ASYNC_MODE == "eventlet":
+        return eventlet.tpool.execute(fn, *args)
+    if ASYNC_MODE == "gevent":
+        return gevent.get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+
+def create_pipeline(cam, reader):
+    """Build and start the processing pipeline for one camera"""
+    pipeline = CameraPipeline(
+        cam, reader, ByteTrack(max_age=30, min_hits=3, iou_threshold=0.3),
+        inference_worker=inference_worker,
+        detector=detector,
+        # one encoder per camera: the nvJPEG staging buffers are not thread-safe
+        encoder=VideoEncoder(quality=70),
+        on_result=on_camera_result
+    )
+    pipeline.start()
+    return pipeline
 
 
 @app.route("/api/start_camera", methods=["POST"])
@@ -347,12 +598,10 @@ def start_camera():
     Start camera stream. Accepts payload:
     { camera: 1|2, source_type: 'webcam'|'video'|'esp32cam', video_path: '...', esp32_url: '...' }
     """
-    global video_reader_1, video_reader_2
-    global is_running_1, is_running_2
-    global tracker_1, tracker_2
-
     data = request.get_json() or {}
     cam = int(data.get("camera", 1))
+    if cam not in cameras:
+        return jsonify({"error": f"Unknown camera {cam}"}), 400
     stype = data.get("source_type", "webcam")
 
     if stype == "webcam":
@@ -362,29 +611,23 @@ def start_camera():
     else:
         source = data.get("esp32_url")
 
+    ctx = cameras[cam]
+
     try:
-        if cam == 1:
-            # close previous if exists
-            if video_reader_1:
-                try:
-                    video_reader_1.release()
-                except Exception:
-                    pass
-            video_reader_1 = VideoReader(source)
-            # create global tracker object so generator can reuse same instance
-            tracker_1 = ByteTrack()
-            is_running_1 = True
-            info = video_reader_1.get_info()
-        else:
-            if video_reader_2:
-                try:
-                    video_reader_2.release()
-                except Exception:
-                    pass
-            video_reader_2 = VideoReader(source)
-            tracker_2 = ByteTrack()
-            is_running_2 = True
-            info = video_reader_2.get_info()
+        # close previous if exists (stop threads before releasing the reader)
+        stop_hls(ctx)
+        if ctx.pipeline:
+            run_blocking(ctx.pipeline.stop)
+        if ctx.reader:
+            try:
+                ctx.reader.release()
+            except Exception:
+                pass
+        ctx.reader = run_blocking(VideoReader, source, FRAME_SIZE)
+        with stats_lock:
+            ctx.det_n = 0
+        ctx.pipeline = create_pipeline(cam, ctx.reader)
+        info = ctx.reader.get_info()
 
         logger.info(f"Started camera {cam} (source={source})")
         # return video metadata to client
@@ -398,36 +641,26 @@ def start_camera():
 def stop_camera():
     """
     Stop camera stream for camera 1 or 2.
-    We set is_running flag to False and release VideoReader.
-    We avoid setting tracker global to None immediately to prevent generator race;
-    instead keep it but allow it to be reused or GC later.
+    The pipeline threads are stopped and joined first, so the VideoReader
+    is never released while a capture thread is still reading from it.
     """
-    global video_reader_1, video_reader_2
-    global is_running_1, is_running_2
-    global tracker_1, tracker_2
-
     cam = int(request.get_json().get("camera", 1))
+    if cam not in cameras:
+        return jsonify({"error": f"Unknown camera {cam}"}), 400
+
+    ctx = cameras[cam]
 
     try:
-        if cam == 1:
-            is_running_1 = False
-            if video_reader_1:
-                try:
-                    video_reader_1.release()
-                except Exception:
-                    logger.exception("Error releasing video_reader_1")
-                video_reader_1 = None
-            # do not immediately destroy tracker_1; let it be GC'd later
-            tracker_1 = None
-        else:
-            is_running_2 = False
-            if video_reader_2:
-                try:
-                    video_reader_2.release()
-                except Exception:
-                    logger.exception("Error releasing video_reader_2")
-                video_reader_2 = None
-            tracker_2 = None
+        stop_hls(ctx)
+        if ctx.pipeline:
+            run_blocking(ctx.pipeline.stop)
+            ctx.pipeline = None
+        if ctx.reader:
+            try:
+                ctx.reader.release()
+            except Exception:
+                logger.exception("Error releasing video reader (camera{})", cam)
+            ctx.reader = None
 
         logger.info(f"Stopped camera {cam}")
         return jsonify({"status": "stopped", "camera": cam})
@@ -445,11 +678,13 @@ def register_tourist():
 
     data = request.get_json()
 
+    # identifiers are cheap to compute here; the encrypted writes happen on the persistence worker
     did = generate_did("tourist")
     id_hash, salt = compute_id_hash(data["id_number"])
 
     tourist_data = {
         "did": did,
+        "id_hash": id_hash,
         "name": data["name"],
         "id_type": data["id_type"],
         "id_number": data["id_number"],
@@ -459,19 +694,20 @@ def register_tourist():
         "itinerary": data.get("itinerary", [])
     }
 
-    tourist_id, stored_hash = db_manager.register_tourist(tourist_data)
-
     feature_id = None
+    feature_data = None
     if "face_images" in data and len(data["face_images"]) > 0 and mongo_manager:
         feature_id = generate_feature_id()
-        mongo_manager.store_tourist_features({
+        feature_data = {
             "feature_id": feature_id,
             "did": did,
             "reid_embedding": [0.0] * 512,
             "camera_id": "registration_desk",
             "capture_angles": [{"angle": "front", "quality_score": 0.95}],
             "feature_quality": 0.95
-        })
+        }
+
+    job_id = submit_registration(tourist_data, feature_data)
 
     qr_data = {
         "did": did,
@@ -480,14 +716,35 @@ def register_tourist():
         "timestamp": datetime.now().isoformat()
     }
 
+    # 202: identifiers are final, the encrypted writes finish on persist_pool
     return jsonify({
         "success": True,
-        "tourist_id": tourist_id,
+        "queued": True,
+        "job": job_id,
         "did": did,
-        "id_hash": stored_hash,
+        "id_hash": id_hash,
         "feature_id": feature_id,
         "qr_data": qr_data
-    })
+    }), 202
+
+
+@app.route("/api/register_status/<job>", methods=["GET"])
+def register_status(job):
+    """State of a queued registration: queued | done | failed"""
+    with enroll_jobs_lock:
+        future = enroll_jobs.get(job)
+
+    if future is None:
+        return jsonify({"error": "Unknown job"}), 404
+
+    if not future.done():
+        return jsonify({"job": job, "status": "queued"})
+
+    error = future.exception()
+    if error is not None:
+        return jsonify({"job": job, "status": "failed", "error": str(error)})
+
+    return jsonify({"job": job, "status": "done", "tourist_id": future.result()})
 
 
 @app.route("/api/search_tourist", methods=["GET"])
@@ -524,17 +781,25 @@ def get_tourist_trajectory():
 
 @app.route("/api/status", methods=["GET"])
 def api_status():
-    # Unified status endpoint used by the dashboard
-    return jsonify({
-        "status": "running",
-        "camera1_running": bool(is_running_1),
-        "camera2_running": bool(is_running_2),
-        "camera1": current_stats.get("camera1", {}),
-        "camera2": current_stats.get("camera2", {}),
-        "total_persons": current_stats.get("total_persons", 0),
-        "device": getattr(detector, "device", "none"),
-        "model_loaded": detector is not None
-    })
+    # Unified status endpoint used by the dashboard (polled; detections stay on socket.io)
+    running = tuple(ctx.running for ctx in cameras.values())
+    key = (stats_version, running, detector is not None)
+
+    cached_key, body = status_cache["entry"]
+    if cached_key != key:
+        with stats_lock:
+            status = {
+                "status": "running",
+                **{f"camera{cam}_running": r for cam, r in zip(cameras, running)},
+                **status_small,
+                "total_persons": current_stats.get("total_persons", 0),
+                "device": getattr(detector, "device", "none"),
+                "model_loaded": detector is not None
+            }
+        body = fast_json.dumpb(status)
+        status_cache["entry"] = (key, body)
+
+    return Response(body, mimetype="application/json")
 
 
 # ----------------------------------------------------
@@ -547,10 +812,8 @@ def handle_connect():
     # when a client connects, push a current stats snapshot immediately
     try:
         socketio.emit("stats", {
-            "camera1": current_stats.get("camera1", {}),
-            "camera2": current_stats.get("camera2", {}),
-            "total_persons": current_stats.get("total_persons", 0),
-            "all_detections": []
+            **{f"camera{cam}": current_stats.get(f"camera{cam}", {}) for cam in CAMERA_IDS},
+            "total_persons": current_stats.get("total_persons", 0)
         })
     except Exception:
         pass
@@ -561,6 +824,92 @@ def handle_disconnect():
     logger.info("Client disconnected")
 
 
+# ----------------------------------------------------
+# STARTUP
+# ----------------------------------------------------
+def init_services():
+    """
+    Load the detector, start the shared inference worker and the stats emitter.
+    Called from __main__ and from wsgi.py (eventlet or gevent server, selectively patched).
+    """
+    global detector, inference_worker
+
+    # Build the FP16 engine once on first start (AUTO_BUILD_ENGINE=1), then reuse it
+    if os.environ.get("AUTO_BUILD_ENGINE") == "1" and not any(
+            os.path.exists(p) for p in ("models/yolov8n_int8.engine", "models/yolov8n.engine")):
+        try:
+            from export_engine import export_engine
+            export_engine()
+        except Exception as e:
+            logger.exception("TensorRT engine build failed, continuing without it: {}", e)
+
+    # Prefer TensorRT engines (see export_engine.py) when they have been built:
+    # INT8 first, then FP16, then (CPU servers) the OpenVINO INT8 export,
+    # then an ONNX export (ONNX Runtime), then the PyTorch weights. A candidate whose
+    # optional runtime is missing or that fails to load falls through to the next one
+    candidates = ["models/yolov8n_int8.engine", "models/yolov8n.engine", "models/yolov8n.onnx"]
+    if os.environ.get("DETECTOR_DEVICE", "cpu") == "cpu":
+        candidates.insert(2, "models/yolov8n_int8_openvino_model")
+    candidates = [p for p in candidates if os.path.exists(p)] + ["models/yolov8n.pt"]
+
+    # CPU inference: keep cores 0-1 for capture/encode/web and give the runtime the rest.
+    # Affinity is per thread and inherited at creation, so the main thread is pinned while
+    # the detector builds its runtime (ONNX Runtime's pool is spawned in the session
+    # constructor), then restored so the threads started later keep every core
+    cpus = None
+    main_cpus = None
+    if os.environ.get("DETECTOR_DEVICE", "cpu") == "cpu" and hasattr(os, "sched_setaffinity"):
+        main_cpus = os.sched_getaffinity(0)
+        if len(main_cpus) >= 4:
+            cpus = set(sorted(main_cpus)[2:])
+            try:
+                os.sched_setaffinity(0, cpus)
+            except OSError as e:
+                logger.warning(f"Could not pin the detector runtime: {e}")
+                cpus = None
+
+    detector = None
+    inference_worker = None
+    try:
+        for model_path in candidates:
+            try:
+                # DETECTOR_DEVICE=cuda runs .pt weights on the GPU (CPU by default)
+                detector = PersonDetector(model_path, conf_threshold=0.4, img_size=320,
+                                          device=os.environ.get("DETECTOR_DEVICE", "cpu"))
+                break
+            except Exception as e:
+                if model_path == candidates[-1]:
+                    logger.exception("Failed to initialize detector: {}", e)
+                else:
+                    logger.warning(f"Could not load {model_path} ({e}), trying the next model")
+    finally:
+        if cpus:
+            os.sched_setaffinity(0, main_cpus)
+
+    if detector is not None:
+        try:
+            # the worker thread (and torch/OpenVINO pools it starts lazily) uses the same cores;
+            # stop OpenCV's own thread pool from competing with the runtime's
+            if detector.device == "cpu":
+                cv2.setNumThreads(1)
+            else:
+                cpus = None
+            inference_worker = InferenceWorker(detector, max_batch=2, cpus=cpus)
+            logger.info(f"Detector initialized ({model_path})")
+        except Exception as e:
+            logger.exception("Failed to initialize detector: {}", e)
+            detector = None
+            inference_worker = None
+
+    # Compile the tracker's IoU kernel now rather than on the first tracked frame
+    _iou_numba.warmup()
+
+    prerender_pages()
+
+    # Single 5 Hz stats emitter for all cameras
+    socketio.start_background_task(stats_emitter)
+
+
 # ----------------------------------------------------
 # SERVER START (BOTTOM ONLY)
 # ----------------------------------------------------
@@ -568,14 +917,10 @@ if __name__ == "__main__":
     logger.info("=" * 60)
     logger.info("🚀 Smart Tourist Safety System - Dual Camera")
     logger.info("=" * 60)
+    logger.info(f"Async mode: {ASYNC_MODE}")
 
     # Instantiate detector (this might be slow)
-    try:
-        detector = PersonDetector("models/yolov8n.pt", conf_threshold=0.4, img_size=320)
-        logger.info("Detector initialized")
-    except Exception as e:
-        logger.exception("Failed to initialize detector: {}", e)
-        detector = None
+    init_services()
 
     # Run socketio/flask app
     socketio.run(app, host="0.0.0.0", port=5000,
@@ -3,33 +3,524 @@ YOLOv8 Person Detector
 Detects persons in video frames using pre-trained YOLOv8x model
 """
 import cv2
+import json
+import os
+import threading
 import torch
+import torch.nn.functional as F
+from collections import OrderedDict
+from pathlib import Path
 from ultralytics import YOLO
 import numpy as np
 from loguru import logger
 
+try:
+    import tensorrt as trt
+except ImportError:
+    trt = None
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+try:
+    import openvino as ov
+except ImportError:
+    ov = None
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+def inference_threads():
+    """
+    CPU threads for the inference runtime: all cores but two, which stay free for
+    the capture/draw/encode threads and the web server (DETECTOR_THREADS overrides)
+    """
+    configured = os.environ.get("DETECTOR_THREADS")
+    if configured:
+        return max(1, int(configured))
+    return max(1, (os.cpu_count() or 1) - 2)
+
+
+# Detections are float32 rows of x1, y1, x2, y2, conf (original frame pixels)
+DET_FIELDS = 5
+
+
+def no_detections():
+    """Empty detection array"""
+    return np.empty((0, DET_FIELDS), dtype=np.float32)
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, boundscheck=False, cache=True)
+    def _bgr_to_blob(src, dst):
+        """
+        BGR->RGB, /255 and HWC->CHW in a single pass over the pixels
+
+        Args:
+            src: uint8 array (B, H, W, 3) of resized BGR frames
+            dst: float32 array (B, 3, H, W), written in place
+        """
+        inv = np.float32(1.0 / 255.0)
+        batch, height, width = src.shape[0], src.shape[1], src.shape[2]
+        for row in prange(batch * height):
+            b = row // height
+            y = row % height
+            for x in range(width):
+                dst[b, 0, y, x] = src[b, y, x, 2] * inv
+                dst[b, 1, y, x] = src[b, y, x, 1] * inv
+                dst[b, 2, y, x] = src[b, y, x, 0] * inv
+else:
+    _bgr_to_blob = None
+
+
+# Rendered "ID #n" label sprites (green box + black text), keyed by tracking ID
+_LABEL_CACHE_SIZE = 128
+_label_cache = OrderedDict()
+# every camera's draw thread shares the cache; move_to_end/popitem must not interleave
+_label_cache_lock = threading.Lock()
+
+
+def _get_id_label(tracking_id):
+    """Return the cached label sprite for a tracking ID, rendering it on a miss"""
+    with _label_cache_lock:
+        sprite = _label_cache.get(tracking_id)
+        if sprite is not None:
+            _label_cache.move_to_end(tracking_id)
+            return sprite
+
+    label = f"ID #{tracking_id}"
+    (text_width, text_height), _ = cv2.getTextSize(
+        label, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2
+    )
+
+    # Same geometry as drawing the filled background + text directly on the frame
+    sprite = np.zeros((text_height + 16, text_width + 11, 3), dtype=np.uint8)
+    sprite[:] = (0, 255, 0)
+    cv2.putText(
+        sprite, label, (5, text_height + 7),
+        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2
+    )
+
+    with _label_cache_lock:
+        _label_cache[tracking_id] = sprite
+        if len(_label_cache) > _LABEL_CACHE_SIZE:
+            _label_cache.popitem(last=False)
+
+    return sprite
+
+
+# Confidence text ("0.00".."1.00") as binary glyph masks: text is drawn in the
+# box color straight over the frame, so only the lit pixels are copied
+_conf_masks = {}
+
+
+def _get_conf_mask(text):
+    """
+    Returns:
+        (mask, ascent): bool mask of the rendered text and its height above the baseline
+    """
+    entry = _conf_masks.get(text)
+    if entry is not None:
+        return entry
+
+    (text_width, text_height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+
+    canvas = np.zeros((text_height + baseline + 2, text_width + 2), dtype=np.uint8)
+    cv2.putText(canvas, text, (0, text_height), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 255, 1)
+
+    entry = _conf_masks[text] = (canvas > 0, text_height)
+    return entry
+
+
+def _blit_mask(frame, mask, color, x, y):
+    """Paint the lit pixels of mask in color with its top-left corner at (x, y), clipped to the frame"""
+    h, w = mask.shape
+    frame_h, frame_w = frame.shape[:2]
+
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, frame_w), min(y + h, frame_h)
+
+    if x0 >= x1 or y0 >= y1:
+        return
+
+    frame[y0:y1, x0:x1][mask[y0 - y:y1 - y, x0 - x:x1 - x]] = color
+
+
+def _blit(frame, sprite, x, y):
+    """Copy sprite into frame with its top-left corner at (x, y), clipped to the frame"""
+    h, w = sprite.shape[:2]
+    frame_h, frame_w = frame.shape[:2]
+
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, frame_w), min(y + h, frame_h)
+
+    if x0 >= x1 or y0 >= y1:
+        return
+
+    frame[y0:y1, x0:x1] = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+
+
+class TRTEngine:
+    """
+    TensorRT runtime for a serialized YOLOv8 engine
+    Input/output buffers are allocated once on the GPU and reused every call
+    """
+
+    def __init__(self, engine_path):
+        """
+        Args:
+            engine_path: Path to .engine file (trtexec or `yolo export format=engine`)
+        """
+        if trt is None:
+            raise ImportError("tensorrt is not installed")
+
+        self.trt_logger = trt.Logger(trt.Logger.WARNING)
+
+        with open(engine_path, 'rb') as f, trt.Runtime(self.trt_logger) as runtime:
+            self.engine = runtime.deserialize_cuda_engine(self._read_engine_bytes(f))
+
+        if self.engine is None:
+            raise RuntimeError(f"Failed to deserialize TensorRT engine: {engine_path}")
+
+        self.context = self.engine.create_execution_context()
+
+        names = [self.engine.get_tensor_name(i) for i in range(self.engine.num_io_tensors)]
+        self.input_name = next(n for n in names if self.engine.get_tensor_mode(n) == trt.TensorIOMode.INPUT)
+        self.output_name = next(n for n in names if self.engine.get_tensor_mode(n) == trt.TensorIOMode.OUTPUT)
+
+        # Dynamic-batch engines (batch dim -1): size buffers for the profile's max batch
+        input_shape = tuple(self.engine.get_tensor_shape(self.input_name))
+        if input_shape[0] == -1:
+            input_shape = tuple(self.engine.get_tensor_profile_shape(self.input_name, 0)[2])
+            self.context.set_input_shape(self.input_name, input_shape)
+
+        self.max_batch = input_shape[0]
+
+        # Allocate one device tensor per I/O binding (engine order)
+        self.buffers = {}
+
+        for name in names:
+            shape = tuple(self.context.get_tensor_shape(name))
+            dtype = torch.float16 if self.engine.get_tensor_dtype(name) == trt.float16 else torch.float32
+
+            self.buffers[name] = torch.empty(shape, dtype=dtype, device='cuda')
+
+            # execute_async_v3 reads bindings from the context instead of a pointer list
+            self.context.set_tensor_address(name, self.buffers[name].data_ptr())
+
+        self.input_shape = input_shape
+        self.input_dtype = self.buffers[self.input_name].dtype
+
+        # Pinned staging buffers so host<->device copies are single async DMAs
+        self.host_input = torch.empty(self.input_shape, dtype=self.input_dtype, pin_memory=True)
+        self.host_output = torch.empty(self.buffers[self.output_name].shape,
+                                       dtype=self.buffers[self.output_name].dtype, pin_memory=True)
+
+        # Raw resized BGR frames (uint8 NHWC): preprocessing writes straight into
+        # this numpy view, then RGB/CHW/normalize run on the GPU in one go
+        _, _, in_h, in_w = self.input_shape
+        self.host_frames = torch.empty((self.max_batch, in_h, in_w, 3), dtype=torch.uint8, pin_memory=True)
+        self.host_frames_array = self.host_frames.numpy()
+        self.device_frames = torch.empty_like(self.host_frames, device='cuda')
+
+        # Full-size frames for GPU-side resize, (re)allocated on the first frame size seen
+        self.host_raw = None
+        self.host_raw_array = None
+        self.device_raw = None
+
+        # Dedicated stream: copies and the engine run off the default stream
+        self.stream = torch.cuda.Stream()
+
+    @staticmethod
+    def _read_engine_bytes(f):
+        """Strip the JSON metadata header that Ultralytics prepends to exported engines"""
+        data = f.read()
+        meta_len = int.from_bytes(data[:4], byteorder='little')
+
+        if 0 < meta_len < len(data) - 4:
+            try:
+                json.loads(data[4:4 + meta_len].decode('utf-8'))
+                return data[4 + meta_len:]
+            except (UnicodeDecodeError, ValueError):
+                pass
+
+        return data
+
+    def infer(self, blob):
+        """
+        Run the engine on a preprocessed NCHW blob
+
+        Args:
+            blob: NCHW numpy array with batch size <= max_batch
+
+        Returns:
+            Raw output for the first `batch` images as a numpy array (float32)
+        """
+        batch = blob.shape[0]
+        self.host_input[:batch].numpy()[...] = blob
+
+        with torch.cuda.stream(self.stream):
+            self.buffers[self.input_name][:batch].copy_(self.host_input[:batch], non_blocking=True)
+
+        return self._execute(batch)
+
+    def infer_frames(self, batch):
+        """
+        Run the engine on the first `batch` resized BGR frames in host_frames_array
+
+        Only uint8 pixels cross the bus (1/2 the bytes of FP16, 1/4 of FP32);
+        BGR->RGB, HWC->CHW and /255 are fused on the device into the input binding
+
+        Returns:
+            Raw output for the first `batch` images as a numpy array (float32)
+        """
+        engine_input = self.buffers[self.input_name][:batch]
+
+        with torch.cuda.stream(self.stream):
+            self.device_frames[:batch].copy_(self.host_frames[:batch], non_blocking=True)
+            engine_input.copy_(self.device_frames[:batch].permute(0, 3, 1, 2).flip(1))
+            engine_input.mul_(1.0 / 255.0)
+
+        return self._execute(batch)
+
+    def infer_raw_frames(self, frames):
+        """
+        Run the engine on full-size BGR frames (all the same shape), resized on the GPU
+
+        The CPU only memcpys pixels into pinned memory; resize, BGR->RGB,
+        HWC->CHW and /255 all run on the device, written into the input binding
+
+        Returns:
+            Raw output for each frame as a numpy array (float32)
+        """
+        batch = len(frames)
+        shape = (self.max_batch,) + frames[0].shape
+
+        if self.host_raw is None or tuple(self.host_raw.shape) != shape:
+            self.host_raw = torch.empty(shape, dtype=torch.uint8, pin_memory=True)
+            self.host_raw_array = self.host_raw.numpy()
+            self.device_raw = torch.empty(shape, dtype=torch.uint8, device='cuda')
+
+        for j, frame in enumerate(frames):
+            self.host_raw_array[j] = frame
+
+        _, _, in_h, in_w = self.input_shape
+        engine_input = self.buffers[self.input_name][:batch]
+
+        with torch.cuda.stream(self.stream):
+            self.device_raw[:batch].copy_(self.host_raw[:batch], non_blocking=True)
+            nchw = self.device_raw[:batch].permute(0, 3, 1, 2).flip(1).to(engine_input.dtype)
+            # bilinear, half-pixel centers: same sampling as cv2.INTER_LINEAR
+            resized = F.interpolate(nchw, size=(in_h, in_w), mode='bilinear', align_corners=False)
+            torch.mul(resized, 1.0 / 255.0, out=engine_input)
+
+        return self._execute(batch)
+
+    def _execute(self, batch):
+        """Run the engine on the input binding and fetch the output (all on self.stream)"""
+        self.context.set_input_shape(self.input_name, (batch,) + tuple(self.input_shape[1:]))
+
+        with torch.cuda.stream(self.stream):
+            self.context.execute_async_v3(self.stream.cuda_stream)
+            self.host_output[:batch].copy_(self.buffers[self.output_name][:batch], non_blocking=True)
+
+        self.stream.synchronize()
+
+        return self.host_output[:batch].numpy().astype(np.float32, copy=False)
+
+
 class PersonDetector:
-    def __init__(self, model_path='models/yolov8n.pt', conf_threshold=0.4, img_size=320):
+    def __init__(self, model_path='models/yolov8n.pt', conf_threshold=0.4, img_size=320, iou_threshold=0.7,
+                 device='cpu', gpu_resize=True):
         """
         Initialize YOLOv8 detector
         
         Args:
-            model_path: Path to YOLOv8 weights
+            model_path: Path to YOLOv8 weights (.pt), ONNX export (.onnx), TensorRT engine (.engine)
+                or OpenVINO export folder (*_openvino_model)
             conf_threshold: Minimum confidence score (0.0 to 1.0)
+            iou_threshold: NMS IoU threshold (TensorRT / ONNX Runtime paths only)
+            device: 'cpu' or 'cuda' for .pt weights (engines/ONNX pick their own device)
+            gpu_resize: TensorRT path resizes on the GPU instead of with cv2 on the CPU
         """
-        logger.info("Initializing YOLOv8n (Nano) Person Detector for CPU...")
-        
-        self.model = YOLO(model_path)
-        self.device = 'cpu'  # Force CPU, previously it was "'cuda' if torch.cuda.is_available() else 'cpu'"
         self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
         self.img_size = img_size
+        self.gpu_resize = gpu_resize
+
+        # CPU preprocessing buffers, allocated on first use (see _cpu_blob)
+        self.staging_frames = None
+        self.staging_blob = None
         
         # COCO dataset class IDs
         self.PERSON_CLASS_ID = 0  # 'person' is class 0 in COCO
+
+        if str(model_path).endswith('.engine'):
+            logger.info(f"Initializing YOLOv8n (Nano) Person Detector with TensorRT ({model_path})...")
+
+            self.backend = 'tensorrt'
+            self.model = None
+            self.engine = TRTEngine(model_path)
+            self.device = 'cuda'
+            self.img_size = self.engine.input_shape[-1]
+        elif str(model_path).rstrip('/\\').endswith('_openvino_model'):
+            logger.info(f"Initializing YOLOv8n (Nano) Person Detector with OpenVINO ({model_path})...")
+
+            self.backend = 'openvino'
+            self.model = None
+            self.engine = self._create_ov_request(model_path)
+            self.device = 'cpu'
+        elif str(model_path).endswith('.onnx'):
+            logger.info(f"Initializing YOLOv8n (Nano) Person Detector with ONNX Runtime ({model_path})...")
+
+            self.backend = 'onnxruntime'
+            self.model = None
+            self.engine = self._create_ort_session(model_path)
+            self.device = 'cuda' if self.engine.get_providers()[0] == 'CUDAExecutionProvider' else 'cpu'
+            self.ort_input_name = self.engine.get_inputs()[0].name
+        else:
+            # CPU unless CUDA is explicitly requested (and actually present)
+            self.device = 'cuda' if device == 'cuda' and torch.cuda.is_available() else 'cpu'
+
+            logger.info(f"Initializing YOLOv8n (Nano) Person Detector for {self.device.upper()}...")
+
+            self.backend = 'torch'
+            self.model = YOLO(model_path)
+            self.engine = None
+
+            if self.device == 'cpu':
+                # a full-width OpenMP pool thrashes against the pipeline threads
+                torch.set_num_threads(inference_threads())
+
+            if self.device == 'cuda':
+                self._init_cuda_staging()
         
-        logger.success(f"Model loaded on device: {self.device}")
-        logger.info(f"Input size: {self.img_size}x{self.img_size} (optimized for CPU)")
+        logger.success(f"Model loaded on device: {self.device} (backend: {self.backend})")
+        logger.info(f"Input size: {self.img_size}x{self.img_size}")
         logger.info(f"Confidence threshold: {self.conf_threshold}")
+
+        # Silently running on the CPU is the most common YOLO deployment mistake
+        if self.device != 'cuda':
+            logger.warning("=" * 60)
+            logger.warning(f"⚠️ Person detector is running on the CPU (backend: {self.backend})")
+            logger.warning("⚠️ Build a TensorRT engine (export_engine.py) for real-time dual camera inference")
+            logger.warning("=" * 60)
+
+        self.warmup()
+
+    def _init_cuda_staging(self, max_batch=2):
+        """
+        Pinned uint8 staging buffer + reused device tensor + dedicated stream for
+        the PyTorch CUDA path: the upload is one async DMA of raw pixels and can
+        overlap with work still queued on other streams
+        """
+        shape = (max_batch, self.img_size, self.img_size, 3)
+
+        self.host_frames = torch.empty(shape, dtype=torch.uint8, pin_memory=True)
+        self.host_frames_array = self.host_frames.numpy()
+        self.device_frames = torch.empty(shape, dtype=torch.uint8, device='cuda')
+        self.stream = torch.cuda.Stream()
+
+    def _predict_torch_cuda(self, frames):
+        """Run the Ultralytics model on frames staged through pinned memory"""
+        batch = len(frames)
+        if batch > self.host_frames.shape[0]:
+            self._init_cuda_staging(batch)
+
+        for j, frame in enumerate(frames):
+            cv2.resize(frame, (self.img_size, self.img_size), dst=self.host_frames_array[j])
+
+        with torch.cuda.stream(self.stream):
+            frames_gpu = self.device_frames[:batch]
+            frames_gpu.copy_(self.host_frames[:batch], non_blocking=True)
+
+            # BGR NHWC uint8 -> RGB NCHW FP16 in [0, 1], on the device
+            tensor = frames_gpu.permute(0, 3, 1, 2).flip(1).half().div_(255.0)
+
+            # Tensor sources skip Ultralytics' own letterbox / normalization
+            results = self.model(
+                tensor,
+                verbose=False,
+                device=self.device,
+                imgsz=self.img_size,
+                half=True,
+                conf=self.conf_threshold,
+                classes=[self.PERSON_CLASS_ID]
+            )
+
+        # the result tensors are read on the caller's (default) stream: order it after
+        # everything queued on the inference stream so it never sees partial results
+        torch.cuda.current_stream().wait_stream(self.stream)
+        return results
+
+    @staticmethod
+    def _create_ort_session(model_path):
+        """ONNX Runtime session with full graph optimization, CUDA first when available"""
+        if ort is None:
+            raise ImportError("onnxruntime is not installed")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = inference_threads()
+
+        providers = [p for p in ('CUDAExecutionProvider', 'CPUExecutionProvider')
+                     if p in ort.get_available_providers()]
+
+        return ort.InferenceSession(model_path, sess_options=options, providers=providers)
+
+    @staticmethod
+    def _create_ov_request(model_dir):
+        """Compile an OpenVINO export (INT8 runs on VNNI/AMX) for the CPU, latency hint"""
+        if ov is None:
+            raise ImportError("openvino is not installed")
+
+        xml_path = next(Path(model_dir).glob('*.xml'))
+        compiled = ov.Core().compile_model(str(xml_path), 'CPU', {'PERFORMANCE_HINT': 'LATENCY',
+                                                                  'INFERENCE_NUM_THREADS': inference_threads()})
+
+        # one reusable request: input/output tensors are allocated once
+        return compiled.create_infer_request()
+
+    def _cpu_blob(self, frames):
+        """
+        Resize + BGR->RGB + /255 + HWC->CHW for the CPU backends
+
+        With numba the frames are resized into a reused uint8 batch and converted by one
+        fused, parallel kernel into a reused float32 blob (no per-call allocation);
+        otherwise cv2.dnn.blobFromImages does the same in one native call
+
+        Returns:
+            float32 array (B, 3, img_size, img_size), only valid until the next call
+        """
+        size = self.img_size
+
+        if _bgr_to_blob is None:
+            return cv2.dnn.blobFromImages(frames, 1.0 / 255.0, (size, size), swapRB=True, crop=False)
+
+        batch = len(frames)
+        if self.staging_frames is None or len(self.staging_frames) < batch:
+            self.staging_frames = np.empty((batch, size, size, 3), dtype=np.uint8)
+            self.staging_blob = np.empty((batch, 3, size, size), dtype=np.float32)
+
+        for j, frame in enumerate(frames):
+            cv2.resize(frame, (size, size), dst=self.staging_frames[j])
+
+        _bgr_to_blob(self.staging_frames[:batch], self.staging_blob[:batch])
+        return self.staging_blob[:batch]
+
+    def warmup(self, runs=3):
+        """Run a few dummy inferences so lazy init / autotuning happens before serving"""
+        dummy = np.zeros((self.img_size, self.img_size, 3), dtype=np.uint8)
+
+        for _ in range(runs):
+            self.detect(dummy)
+
+        logger.info(f"Detector warmed up ({runs} runs)")
     
     def detect(self, frame):
         """
@@ -39,60 +530,143 @@ class PersonDetector:
             frame: OpenCV image (numpy array)
         
         Returns:
-            List of detections: [
-                {
-                    'bbox': [x1, y1, x2, y2],
-                    'confidence': float,
-                    'class': 'person'
-                },
-                ...
-            ]
-        """
-         # Resize frame for faster processing
-        original_height, original_width = frame.shape[:2]
-        resized_frame = cv2.resize(frame, (self.img_size, self.img_size))
-
-        
-        # Run inference
-        results = self.model(
-            resized_frame,
-            verbose=False,
-            device=self.device,
-            imgsz=self.img_size,
-            half=False,  # No half precision on CPU
-            conf=self.conf_threshold
-        )
-        
-        detections = []
-        
-        for result in results:
-            boxes = result.boxes
-            
-            for box in boxes:
-                # Get class ID
-                cls_id = int(box.cls[0])
-                
-                # Only process 'person' class
-                if cls_id == self.PERSON_CLASS_ID:
-                    conf = float(box.conf[0])
-                    
-                    if conf >= self.conf_threshold:
-                        # Get bounding box (xyxy format)
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-
-                        # Scale coordinates back to original frame size
-                        x1 = int(x1 * original_width / self.img_size)
-                        y1 = int(y1 * original_height / self.img_size)
-                        x2 = int(x2 * original_width / self.img_size)
-                        y2 = int(y2 * original_height / self.img_size)
-                        
-                        detections.append({
-                            'bbox': [x1, y1, x2, y2],
-                            'confidence': round(float(conf), 3),
-                            'class': 'person'
-                        })
-        
-        return detections
+            float32 array (N, 5): one row [x1, y1, x2, y2, confidence] per person
+        """
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        """
+        Detect persons in several frames with a single forward pass
+        
+        Args:
+            frames: List of OpenCV images (may differ in size)
+        
+        Returns:
+            List with one detection array (same format as detect) per frame
+        """
+        if len(frames) == 0:
+            return []
+
+        if self.backend == 'tensorrt':
+            return self._detect_trt_batch(frames)
+
+        if self.backend == 'onnxruntime':
+            return self._detect_ort_batch(frames)
+
+        if self.backend == 'openvino':
+            return self._detect_ov_batch(frames)
+
+        if self.device == 'cuda':
+            results = self._predict_torch_cuda(frames)
+        else:
+            # Preprocessed BCHW tensor: Ultralytics skips its own letterbox/normalize
+            batch = torch.from_numpy(self._cpu_blob(frames))
+
+            # Run inference
+            results = self.model(
+                batch,
+                verbose=False,
+                device=self.device,
+                imgsz=self.img_size,
+                half=False,  # No half precision on CPU
+                conf=self.conf_threshold,
+                classes=[self.PERSON_CLASS_ID]
+            )
+        
+        all_detections = []
+        
+        for frame, result in zip(frames, results):
+            original_height, original_width = frame.shape[:2]
+
+            # rows of x1, y1, x2, y2, conf, cls (on the GPU for the CUDA path)
+            data = result.boxes.data
+
+            # class-0 filter and confidence threshold as a single boolean mask, then
+            # scale coordinates back to original frame size (conf column scaled by 1);
+            # both run where the boxes live, so only kept rows cross to the host, in one copy
+            data = data[(data[:, 5] == self.PERSON_CLASS_ID) & (data[:, 4] >= self.conf_threshold)]
+            scale = torch.tensor([original_width, original_height, original_width, original_height, self.img_size],
+                                 dtype=data.dtype, device=data.device) / self.img_size
+
+            all_detections.append((data[:, :DET_FIELDS] * scale).float().cpu().numpy())
+        
+        return all_detections
+
+    def _detect_trt_batch(self, frames):
+        """Detect persons with the TensorRT engine (same output format as detect_batch)"""
+        all_detections = []
+
+        # Engines built with a fixed batch of 1 are simply called once per frame
+        step = self.engine.max_batch
+
+        for i in range(0, len(frames), step):
+            chunk = frames[i:i + step]
+
+            # Output layout: (B, 4 + num_classes, num_anchors) with boxes as cx, cy, w, h
+            if self.gpu_resize and all(frame.shape == chunk[0].shape for frame in chunk):
+                # Whole preprocessing on the GPU; the CPU only copies pixels
+                outputs = self.engine.infer_raw_frames(chunk)
+            else:
+                # The CPU only resizes, straight into the pinned staging buffer;
+                # color swap, layout and normalization happen on the GPU
+                host = self.engine.host_frames_array
+                for j, frame in enumerate(chunk):
+                    cv2.resize(frame, (self.img_size, self.img_size), dst=host[j])
+
+                outputs = self.engine.infer_frames(len(chunk))
+
+            for frame, output in zip(chunk, outputs):
+                all_detections.append(self._parse_raw_output(output, frame.shape[:2]))
+
+        return all_detections
+
+    def _detect_ort_batch(self, frames):
+        """Detect persons with ONNX Runtime (same output format as detect_batch)"""
+        blob = self._cpu_blob(frames)
+
+        # Same raw layout as the TensorRT engine: (B, 4 + num_classes, num_anchors)
+        outputs = self.engine.run(None, {self.ort_input_name: blob})[0]
+
+        return [self._parse_raw_output(output, frame.shape[:2])
+                for frame, output in zip(frames, outputs)]
+
+    def _detect_ov_batch(self, frames):
+        """Detect persons with OpenVINO (same output format as detect_batch)"""
+        blob = self._cpu_blob(frames)
+
+        # Same raw layout as the TensorRT engine: (B, 4 + num_classes, num_anchors)
+        # share_inputs: the request reads the blob in place instead of copying it
+        self.engine.infer({0: blob}, share_inputs=True)
+        outputs = self.engine.get_output_tensor(0).data
+
+        return [self._parse_raw_output(output, frame.shape[:2])
+                for frame, output in zip(frames, outputs)]
+
+    def _parse_raw_output(self, output, original_shape):
+        """Filter, NMS and rescale one image's raw YOLOv8 head output (TensorRT / ONNX)"""
+        original_height, original_width = original_shape
+
+        # Only the person score row is needed, no argmax over all classes
+        scores = output[4 + self.PERSON_CLASS_ID]
+        mask = scores >= self.conf_threshold
+
+        if not np.any(mask):
+            return no_detections()
+
+        cx, cy, w, h = output[:4, mask]
+        scores = scores[mask]
+
+        boxes_xywh = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+        keep = np.array(cv2.dnn.NMSBoxes(boxes_xywh.tolist(), scores.tolist(),
+                                         self.conf_threshold, self.iou_threshold), dtype=np.int64).reshape(-1)
+
+        scale_x = original_width / self.img_size
+        scale_y = original_height / self.img_size
+
+        x, y, bw, bh = boxes_xywh[keep].T
+
+        return np.stack([x * scale_x, y * scale_y, (x + bw) * scale_x, (y + bh) * scale_y,
+                         scores[keep]], axis=1).astype(np.float32, copy=False)
     
     def draw_detections(self, frame, detections, color=(0, 255, 0), thickness=2):
         """
@@ -100,17 +674,16 @@ class PersonDetector:
         
         Args:
             frame: OpenCV image
-            detections: List of detection dicts
+            detections: Detection array from detect (rows of x1, y1, x2, y2, conf)
             color: BGR color tuple
             thickness: Line thickness
         
         Returns:
             Annotated frame
         """
-        for det in detections:
-            x1, y1, x2, y2 = det['bbox']
-            conf = det['confidence']
-            
+        boxes = detections[:, :4].astype(np.int32).tolist()
+        
+        for (x1, y1, x2, y2), conf in zip(boxes, detections[:, 4].tolist()):
             # Draw rectangle
             cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
             
@@ -121,6 +694,7 @@ class PersonDetector:
                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2
             )
         
+        return frame
     
     def draw_tracked_detections(self, frame, tracked_objects, color=(0, 255, 0), thickness=2):
         """
@@ -128,49 +702,31 @@ class PersonDetector:
         
         Args:
             frame: OpenCV image
-            tracked_objects: List of tracked object dicts with 'bbox', 'tracking_id', 'confidence'
+            tracked_objects: Structured track array from ByteTrack.update ('id', 'x1'..'y2', 'conf')
             color: BGR color tuple
             thickness: Line thickness
         
         Returns:
             Annotated frame
         """
-        for obj in tracked_objects:
-            x1, y1, x2, y2 = obj['bbox']
-            tracking_id = obj['tracking_id']
-            conf = obj['confidence']
-            
+        if len(tracked_objects) == 0:
+            return frame
+        
+        # Column-wise conversion once, then plain Python ints/floats for the cv2 calls
+        boxes = np.stack([tracked_objects['x1'], tracked_objects['y1'],
+                          tracked_objects['x2'], tracked_objects['y2']], axis=1).astype(np.int32).tolist()
+        
+        for (x1, y1, x2, y2), tracking_id, conf in zip(boxes, tracked_objects['id'].tolist(),
+                                                         tracked_objects['conf'].tolist()):
             # Draw rectangle
             cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
             
-            # Draw tracking ID label (larger and prominent)
-            label = f"ID #{tracking_id}"
-            label_conf = f"{conf:.2f}"
-            
-            # Background for ID
-            (text_width, text_height), _ = cv2.getTextSize(
-                label, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2
-            )
-            
-            cv2.rectangle(
-                frame,
-                (x1, y1 - text_height - 15),
-                (x1 + text_width + 10, y1),
-                (0, 255, 0),
-                -1
-            )
-            
-            # Draw ID text
-            cv2.putText(
-                frame, label, (x1 + 5, y1 - 8),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2
-            )
+            # Draw tracking ID label (larger and prominent), rendered once per ID
+            label_sprite = _get_id_label(tracking_id)
+            _blit(frame, label_sprite, x1, y1 - label_sprite.shape[0] + 1)
             
-            # Draw confidence below
-            cv2.putText(
-                frame, label_conf, (x1, y2 + 20),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1
-            )
+            # Draw confidence below (baseline at y2 + 20), from the cached glyph mask
+            mask, ascent = _get_conf_mask(f"{conf:.2f}")
+            _blit_mask(frame, mask, color, x1, y2 + 20 - ascent)
         
         return frame
-
@@ -0,0 +1,156 @@
+"""
+Camera Mosaic
+Tiles the annotated frames of every camera side by side and JPEG-encodes
+the composite once per update, for a single combined MJPEG stream
+"""
+import threading
+import time
+import cv2
+import numpy as np
+from loguru import logger
+
+
+class MosaicStream:
+    def __init__(self, camera_ids, frame_size, encoder, get_pipeline, max_fps=25):
+        """
+        Args:
+            camera_ids: Cameras in left-to-right tile order
+            frame_size: (width, height) of one tile
+            encoder: VideoEncoder owned by the mosaic (not shared with a pipeline)
+            get_pipeline: Callable(camera_id) -> the camera's current CameraPipeline or None
+            max_fps: Upper bound on composite encodes per second
+        """
+        self.camera_ids = tuple(camera_ids)
+        self.frame_size = tuple(frame_size)
+        self.encoder = encoder
+        self.get_pipeline = get_pipeline
+        self.min_interval = 1.0 / max_fps
+
+        width, height = self.frame_size
+        self.canvas = np.zeros((height, width * len(self.camera_ids), 3), dtype=np.uint8)
+        self._canvas_lock = threading.Lock()
+        self._updated = threading.Event()
+
+        self.attached = {}  # camera_id -> (pipeline, sink) currently feeding the canvas
+
+        # latest composite JPEG as (sequence number, bytes), same contract as CameraPipeline
+        self._latest = (0, None)
+        self._frame_cond = threading.Condition()
+
+        self.viewers = 0
+        self._viewers_lock = threading.Lock()
+        self.thread = None
+
+    def add_viewer(self):
+        """Register a client; the first one starts the compositing thread"""
+        with self._viewers_lock:
+            self.viewers += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="Mosaic", daemon=True)
+                self.thread.start()
+
+    def remove_viewer(self):
+        with self._viewers_lock:
+            self.viewers = max(0, self.viewers - 1)
+
+    def latest_frame(self):
+        return self._latest
+
+    def wait_frame(self, last_seq, timeout=1.0):
+        """Block until a composite newer than last_seq is published; returns (seq, jpeg)"""
+        with self._frame_cond:
+            if self._latest[0] == last_seq:
+                self._frame_cond.wait(timeout)
+            return self._latest
+
+    def _make_sink(self, index):
+        """Frame sink copying a camera's annotated frames into its tile"""
+        width, height = self.frame_size
+        tile = self.canvas[:, index * width:(index + 1) * width]
+
+        def sink(frame):
+            if frame.shape[1] != width or frame.shape[0] != height:
+                frame = cv2.resize(frame, (width, height))
+            with self._canvas_lock:
+                tile[...] = frame
+            self._updated.set()
+
+        return sink
+
+    def _detach(self, camera_id):
+        pipeline, sink = self.attached.pop(camera_id)
+        try:
+            pipeline.frame_sinks.remove(sink)
+        except ValueError:
+            pass
+        pipeline.remove_subscriber()
+
+        # blank the tile of a camera that went away
+        width, _ = self.frame_size
+        index = self.camera_ids.index(camera_id)
+        with self._canvas_lock:
+            self.canvas[:, index * width:(index + 1) * width] = 0
+        self._updated.set()
+
+    def _sync(self):
+        """Follow camera (re)starts: hook into each camera's current pipeline"""
+        for index, camera_id in enumerate(self.camera_ids):
+            pipeline = self.get_pipeline(camera_id)
+            if pipeline is not None and not pipeline.running:
+                pipeline = None
+
+            current = self.attached.get(camera_id)
+            if current is not None and current[0] is pipeline:
+                continue
+            if current is not None:
+                self._detach(camera_id)
+            if pipeline is not None:
+                sink = self._make_sink(index)
+                # counts as a viewer so the pipeline keeps drawing annotated frames
+                pipeline.add_subscriber()
+                pipeline.frame_sinks.append(sink)
+                self.attached[camera_id] = (pipeline, sink)
+
+    def _run(self):
+        """Composite + encode whenever a tile changed, at most max_fps times a second"""
+        logger.info("Mosaic stream started")
+        last_encode = 0.0
+
+        while True:
+            with self._viewers_lock:
+                if self.viewers == 0:
+                    # unhook under the lock so a new first viewer starts a fresh thread
+                    for camera_id in list(self.attached):
+                        self._detach(camera_id)
+                    self.thread = None
+                    break
+
+            try:
+                self._sync()
+
+                if not self._updated.wait(0.1):
+                    continue
+
+                wait = last_encode + self.min_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                self._updated.clear()
+
+                with self._canvas_lock:
+                    composite = self.canvas.copy()
+
+                # one encode for all cameras (libjpeg setup paid once per composite)
+                jpeg = self.encoder.encode(composite)
+                last_encode = time.monotonic()
+                if jpeg is None:
+                    continue
+
+                with self._frame_cond:
+                    self._latest = (self._latest[0] + 1, jpeg)
+                    self._frame_cond.notify_all()
+
+            except Exception as e:
+                logger.exception("Mosaic stream failed: {}", e)
+                time.sleep(0.1)
+
+        logger.info("Mosaic stream stopped")
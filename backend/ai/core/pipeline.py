@@ -0,0 +1,482 @@
+"""
+Camera Processing Pipeline
+Shares a single detector between all camera streams and runs each camera
+as a multi-stage producer/consumer pipeline
+"""
+import os
+import queue
+import threading
+import time
+import numpy as np
+from loguru import logger
+from utils.rate_limited_logger import RateLimitedLogger
+from .detector import no_detections
+
+# per-frame handlers: one traceback per stage and camera every 5 s
+frame_errors = RateLimitedLogger(interval=5.0)
+
+
+class InferenceWorker:
+    """
+    Shared inference thread
+    Collects frames posted by every camera and runs them through the detector
+    as one batch, then routes each result back to the camera that sent it
+    """
+
+    def __init__(self, detector, max_batch=2, batch_window=0.005, cpus=None):
+        """
+        Args:
+            detector: PersonDetector instance (must provide detect_batch)
+            max_batch: Maximum number of frames per forward pass
+            batch_window: Seconds to wait for more frames after the first arrives
+            cpus: CPU ids to pin the inference thread to (Linux only, None = no pinning)
+        """
+        self.detector = detector
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.cpus = cpus
+
+        self.requests = queue.Queue()
+        self.results = {}  # camera_id -> Queue(maxsize=1)
+        self.active_cameras = set()  # cameras currently feeding frames
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.thread = threading.Thread(target=self._run, name="InferenceWorker", daemon=True)
+        self.thread.start()
+
+        logger.info(f"InferenceWorker started: max_batch={max_batch}, window={batch_window * 1000:.0f}ms")
+
+    def _result_queue(self, camera_id):
+        """Get (or lazily create) the result slot for a camera"""
+        with self._lock:
+            if camera_id not in self.results:
+                self.results[camera_id] = queue.Queue(maxsize=1)
+            return self.results[camera_id]
+
+    def register(self, camera_id):
+        """Mark a camera as active so batches wait for its frame"""
+        with self._lock:
+            self.active_cameras.add(camera_id)
+
+    def unregister(self, camera_id):
+        """Stop waiting for a camera that is no longer running"""
+        with self._lock:
+            self.active_cameras.discard(camera_id)
+
+    def _batch_target(self):
+        """One frame per active camera, capped at max_batch"""
+        with self._lock:
+            return max(1, min(self.max_batch, len(self.active_cameras)))
+
+    def detect(self, camera_id, frame, timeout=5.0):
+        """
+        Submit a frame and block until its detections are ready
+
+        Returns:
+            Detection array (same format as PersonDetector.detect)
+        """
+        self.submit(camera_id, frame)
+        return self._result_queue(camera_id).get(timeout=timeout)
+
+    def submit(self, camera_id, frame):
+        """Queue a frame for detection without waiting (collect it with poll)"""
+        result_q = self._result_queue(camera_id)
+
+        # Drop a stale result left behind by an earlier abandoned request
+        try:
+            result_q.get_nowait()
+        except queue.Empty:
+            pass
+
+        self.requests.put((camera_id, frame))
+
+    def poll(self, camera_id):
+        """
+        Returns:
+            Detections for the camera's submitted frame, or None if not ready yet
+        """
+        try:
+            return self._result_queue(camera_id).get_nowait()
+        except queue.Empty:
+            return None
+
+    def _run(self):
+        """Batch frames from the request queue and dispatch results"""
+        if self.cpus and hasattr(os, 'sched_setaffinity'):
+            # pid 0 = this thread only; pools the runtime spawns lazily on the first
+            # forward pass inherit it (init_services pins the ones built at load time)
+            try:
+                os.sched_setaffinity(0, self.cpus)
+                logger.info(f"InferenceWorker pinned to CPUs {sorted(self.cpus)}")
+            except OSError as e:
+                logger.warning(f"Could not pin InferenceWorker: {e}")
+
+        while not self._stop.is_set():
+            try:
+                camera_id, frame = self.requests.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            # camera_id -> newest frame: a camera that resubmitted after a timeout
+            # is inferred once, on its freshest frame, instead of filling the batch
+            batch = {camera_id: frame}
+
+            # Give the other active camera a short window to join this forward pass;
+            # with a single camera running the frame is dispatched immediately
+            target = self._batch_target()
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    camera_id, frame = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch[camera_id] = frame
+
+            camera_ids = list(batch)
+            frames = list(batch.values())
+
+            try:
+                results = self.detector.detect_batch(frames)
+            except Exception as e:
+                frame_errors.exception("infer-batch", "Batched inference failed: {}", e)
+                results = [no_detections() for _ in frames]
+
+            for camera_id, detections in zip(camera_ids, results):
+                result_q = self._result_queue(camera_id)
+                try:
+                    result_q.put_nowait(detections)
+                except queue.Full:
+                    # Previous result was never collected; replace it
+                    try:
+                        result_q.get_nowait()
+                    except queue.Empty:
+                        pass
+                    result_q.put_nowait(detections)
+
+    def stop(self):
+        """Stop the worker thread"""
+        self._stop.set()
+        self.thread.join(timeout=1.0)
+        logger.info("InferenceWorker stopped")
+
+
+def same_frame(last, frame, tracks):
+    """
+    True when (frame, tracks) would draw exactly what was last published: every
+    pixel is compared (a sampled fingerprint misses small changes and leaves the
+    stream frozen on a stale frame), tracks are the raw rows (ids and boxes)
+    """
+    if last is None:
+        return False
+    last_frame, last_tracks = last
+    return tracks == last_tracks and np.array_equal(frame, last_frame)
+
+
+def put_latest(q, item):
+    """Put into a bounded queue, dropping the oldest item when it is full"""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+class CameraPipeline:
+    """
+    Per-camera processing pipeline
+    capture -> infer (+ track) -> draw -> encode, each stage on its own thread
+    connected by bounded drop-oldest queues, so frame N can be encoded while
+    N+1 is in detection and N+2 is being captured
+
+    Detection is feedback driven: a frame is submitted whenever this camera has
+    no request in flight, and frames arriving meanwhile reuse the last tracks
+    """
+
+    # give up on an in-flight request after this long (worker stalled or restarted)
+    INFER_TIMEOUT = 5.0
+    # weight of the newest frame interval in the fps average
+    FPS_ALPHA = 0.1
+
+    def __init__(self, camera_id, video_reader, tracker, inference_worker=None, detector=None,
+                 encoder=None, on_result=None, queue_size=2):
+        """
+        Args:
+            camera_id: Camera number (used for logging and batching)
+            video_reader: Opened VideoReader (already delivering display-sized frames)
+            tracker: ByteTrack instance owned by this pipeline
+            inference_worker: Shared InferenceWorker (None = no detection)
+            detector: PersonDetector used for drawing (None = no overlay)
+            encoder: VideoEncoder producing JPEG bytes
+            on_result: Callback(camera_id, fps, tracked) after each tracked frame
+            queue_size: Capacity of the queues between stages
+        """
+        self.camera_id = camera_id
+        self.video_reader = video_reader
+        self.tracker = tracker
+        self.inference_worker = inference_worker
+        self.detector = detector
+        self.encoder = encoder
+        self.on_result = on_result
+
+        self.capture_q = queue.Queue(maxsize=queue_size)
+        self.draw_q = queue.Queue(maxsize=queue_size)
+        self.encode_q = queue.Queue(maxsize=queue_size)
+        # latest encoded JPEG as (sequence number, bytes), shared by every viewer;
+        # each client remembers the last sequence it sent, so none sends a frame twice
+        self._latest = (0, None)
+        self._frame_cond = threading.Condition()
+
+        # set -> every stage exits; also set by capture on end of stream
+        self._stop_event = threading.Event()
+        self._stop_event.set()
+        self.threads = []
+
+        # number of HTTP clients currently pulling the MJPEG stream
+        self.subscribers = 0
+        self._subscribers_lock = threading.Lock()
+
+        # extra consumers of annotated frames (e.g. HLSStreamer.push), called from the encode stage
+        self.frame_sinks = []
+
+    def add_subscriber(self):
+        with self._subscribers_lock:
+            self.subscribers += 1
+
+    def remove_subscriber(self):
+        with self._subscribers_lock:
+            self.subscribers = max(0, self.subscribers - 1)
+
+    @property
+    def running(self):
+        return not self._stop_event.is_set()
+
+    def latest_frame(self):
+        """
+        Returns:
+            (seq, jpeg) of the newest encoded frame (seq 0 / None before the first)
+        """
+        return self._latest
+
+    def wait_frame(self, last_seq, timeout=1.0):
+        """
+        Block until a frame newer than last_seq is published (or timeout)
+
+        Returns:
+            (seq, jpeg); seq == last_seq means nothing new arrived
+        """
+        with self._frame_cond:
+            if self._latest[0] == last_seq:
+                self._frame_cond.wait(timeout)
+            return self._latest
+
+    def _publish_frame(self, jpeg):
+        """Replace the latest frame and wake every waiting viewer"""
+        with self._frame_cond:
+            self._latest = (self._latest[0] + 1, jpeg)
+            self._frame_cond.notify_all()
+
+    def start(self):
+        """Start all stage threads"""
+        self._stop_event.clear()
+
+        stages = [
+            ("Capture", self._capture_loop),
+            ("Infer", self._infer_loop),
+            ("Draw", self._draw_loop),
+            ("Encode", self._encode_loop),
+        ]
+
+        if self.inference_worker is not None:
+            self.inference_worker.register(self.camera_id)
+
+        for name, target in stages:
+            thread = threading.Thread(target=target, name=f"{name}-cam{self.camera_id}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+        logger.info(f"Camera {self.camera_id} pipeline started")
+
+    def stop(self):
+        """Signal all stages to finish and wait for them"""
+        self._stop_event.set()
+
+        if self.inference_worker is not None:
+            self.inference_worker.unregister(self.camera_id)
+
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2.0)
+
+        self.threads = []
+        logger.info(f"Camera {self.camera_id} pipeline stopped")
+
+    def _get(self, q):
+        """Blocking get that wakes up periodically to check for stop"""
+        while not self._stop_event.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _put(self, q, item):
+        """Blocking put that wakes up periodically to check for stop"""
+        while not self._stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _capture_loop(self):
+        """Stage 1: read frames"""
+        frame_count = 0
+        # live sources keep only the newest frames; files must not drop any, so
+        # capture waits for the infer stage instead of decoding ahead and discarding
+        live = getattr(self.video_reader, 'is_live', True)
+
+        while not self._stop_event.is_set():
+            try:
+                ret, frame = self.video_reader.read()
+                if not ret or frame is None:
+                    logger.info(f"Camera {self.camera_id} read returned no frame, stopping pipeline")
+                    self._stop_event.set()
+                    if self.inference_worker is not None:
+                        self.inference_worker.unregister(self.camera_id)
+                    break
+
+                frame_count += 1
+                if live:
+                    put_latest(self.capture_q, (frame_count, frame))
+                else:
+                    self._put(self.capture_q, (frame_count, frame))
+
+            except Exception as e:
+                frame_errors.exception(f"capture-{self.camera_id}", "Capture failed (camera{}): {}", self.camera_id, e)
+                self._stop_event.wait(0.1)
+
+    def _infer_loop(self):
+        """Stage 2: detect (whenever the inference worker is free) and track"""
+        last_tracked = []
+        submitted_at = None  # monotonic time of the in-flight request, None when idle
+
+        # exponentially weighted frame interval -> live fps that never drifts
+        last_ns = None
+        interval_ns = 0.0
+
+        while not self._stop_event.is_set():
+            item = self._get(self.capture_q)
+            if item is None:
+                break
+
+            _, frame = item
+
+            try:
+                detections = None
+
+                if self.inference_worker is not None:
+                    if submitted_at is not None:
+                        detections = self.inference_worker.poll(self.camera_id)
+                        if detections is not None:
+                            submitted_at = None
+                        elif time.monotonic() - submitted_at > self.INFER_TIMEOUT:
+                            logger.warning(f"Detection timed out (camera{self.camera_id}), resubmitting")
+                            submitted_at = None
+
+                    # Worker is free for this camera: hand it the freshest frame. The worker
+                    # gets its own copy because the draw stage annotates this one in place,
+                    # possibly before the worker (busy with another camera) has read it
+                    if submitted_at is None:
+                        self.inference_worker.submit(self.camera_id, frame.copy())
+                        submitted_at = time.monotonic()
+
+                if detections is not None:
+                    # update tracking (guarded)
+                    try:
+                        last_tracked = self.tracker.update(detections)
+                    except Exception as e:
+                        frame_errors.exception(f"track-{self.camera_id}",
+                                               "Tracker update failed (camera{}): {}", self.camera_id, e)
+
+                tracked = last_tracked
+
+                # EWMA of the frame interval (monotonic clock, immune to NTP jumps);
+                # averaging the interval rather than 1/dt keeps the rate unbiased
+                now_ns = time.monotonic_ns()
+                if last_ns is not None:
+                    dt = now_ns - last_ns
+                    interval_ns = dt if interval_ns == 0.0 else (1 - self.FPS_ALPHA) * interval_ns + self.FPS_ALPHA * dt
+                last_ns = now_ns
+                fps = 1e9 / interval_ns if interval_ns > 0 else 0.0
+
+                if self.on_result:
+                    self.on_result(self.camera_id, fps, tracked)
+
+                # Nobody is watching: detection, tracking and stats run at full rate,
+                # only drawing/encoding is skipped
+                if self.subscribers > 0:
+                    put_latest(self.draw_q, (frame, tracked))
+
+            except Exception as e:
+                frame_errors.exception(f"infer-{self.camera_id}", "Inference stage failed (camera{}): {}", self.camera_id, e)
+                self._stop_event.wait(0.1)
+
+    def _draw_loop(self):
+        """Stage 3: draw tracked boxes and IDs"""
+        last = None  # (undrawn frame, track bytes) last handed to the encoder
+
+        while not self._stop_event.is_set():
+            item = self._get(self.draw_q)
+            if item is None:
+                break
+
+            frame, tracked = item
+
+            try:
+                # Same pixels and same tracks as the frame already published
+                # (source repeating its last frame, e.g. a stalled stream): skip draw + encode
+                tracks = tracked.tobytes() if hasattr(tracked, 'tobytes') else b''
+                if same_frame(last, frame, tracks):
+                    continue
+                # copy: drawing below annotates frame in place
+                last = (frame.copy(), tracks)
+
+                if self.detector:
+                    frame = self.detector.draw_tracked_detections(frame, tracked)
+
+                put_latest(self.encode_q, frame)
+
+            except Exception as e:
+                frame_errors.exception(f"draw-{self.camera_id}", "Draw stage failed (camera{}): {}", self.camera_id, e)
+
+    def _encode_loop(self):
+        """Stage 4: JPEG-encode annotated frames"""
+        while not self._stop_event.is_set():
+            frame = self._get(self.encode_q)
+            if frame is None:
+                break
+
+            try:
+                for sink in self.frame_sinks:
+                    sink(frame)
+
+                # Another frame is already waiting: we're falling behind, encode cheaper
+                quality = self.encoder.low_quality if self.encode_q.qsize() > 0 else None
+
+                jpeg = self.encoder.encode(frame, quality)
+                if jpeg is None:
+                    frame_errors.warning(f"encode-none-{self.camera_id}", "Failed to encode frame for camera{}", self.camera_id)
+                    continue
+
+                self._publish_frame(jpeg)
+
+            except Exception as e:
+                frame_errors.exception(f"encode-{self.camera_id}", "Encode stage failed (camera{}): {}", self.camera_id, e)
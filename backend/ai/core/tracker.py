@@ -2,104 +2,198 @@
 ByteTrack Tracker
 Assigns persistent IDs to detected persons across frames
 """
+import itertools
+import threading
 import numpy as np
 from scipy.optimize import linear_sum_assignment
-from filterpy.kalman import KalmanFilter
 from loguru import logger
 
+try:
+    import lap
+except ImportError:
+    lap = None
 
-class KalmanBoxTracker:
+from ._iou_numba import iou_matrix_nb
+
+# One row per confirmed track (returned by ByteTrack.update)
+TRACK_DTYPE = np.dtype([
+    ('id', np.int32),
+    ('x1', np.float32), ('y1', np.float32), ('x2', np.float32), ('y2', np.float32),
+    ('conf', np.float32),
+    ('cls', np.int16),  # 0 = person
+])
+
+
+# Constant-velocity box model shared by every track, state [cx, cy, w, h, vx, vy, vw, vh]
+# State transition matrix
+KF_F = np.array([
+    [1, 0, 0, 0, 1, 0, 0, 0],
+    [0, 1, 0, 0, 0, 1, 0, 0],
+    [0, 0, 1, 0, 0, 0, 1, 0],
+    [0, 0, 0, 1, 0, 0, 0, 1],
+    [0, 0, 0, 0, 1, 0, 0, 0],
+    [0, 0, 0, 0, 0, 1, 0, 0],
+    [0, 0, 0, 0, 0, 0, 1, 0],
+    [0, 0, 0, 0, 0, 0, 0, 1]
+], dtype=np.float64)
+
+# Measurement matrix
+KF_H = np.array([
+    [1, 0, 0, 0, 0, 0, 0, 0],
+    [0, 1, 0, 0, 0, 0, 0, 0],
+    [0, 0, 1, 0, 0, 0, 0, 0],
+    [0, 0, 0, 1, 0, 0, 0, 0]
+], dtype=np.float64)
+
+# Covariance matrices (process noise, measurement noise, initial state)
+KF_Q = np.eye(8)
+KF_Q[4:, 4:] *= 0.01
+KF_R = np.eye(4) * 10.0
+KF_P0 = np.eye(8)
+KF_P0[4:, 4:] *= 1000.0
+
+# Built once at import and shared read-only by every track: creating a track allocates
+# no matrices. TrackerPool.predict_all/update use the block structure of F and H
+# directly; these arrays are the reference definition of that model.
+for _m in (KF_F, KF_H, KF_Q, KF_R, KF_P0):
+    _m.flags.writeable = False
+
+
+# Track IDs come from one process-wide counter shared by every pool (like the old
+# KalmanBoxTracker.count), so IDs are unique across cameras and camera restarts
+_track_ids = itertools.count()
+_track_ids_lock = threading.Lock()
+
+
+def _next_track_ids(k):
+    """Allocate k new track IDs"""
+    with _track_ids_lock:
+        return np.array([next(_track_ids) for _ in range(k)], dtype=np.int64)
+
+
+def _bbox_to_z(bboxes):
+    """Convert rows of [x1, y1, x2, y2] to rows of [cx, cy, w, h]"""
+    b = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    w = b[:, 2] - b[:, 0]
+    h = b[:, 3] - b[:, 1]
+    return np.stack([b[:, 0] + w / 2.0, b[:, 1] + h / 2.0, w, h], axis=1)
+
+
+def _z_to_bbox(z):
+    """Convert rows of [cx, cy, w, h] to rows of [x1, y1, x2, y2]"""
+    half = z[:, 2:4] / 2.0
+    return np.concatenate([z[:, :2] - half, z[:, :2] + half], axis=1)
+
+
+class TrackerPool:
     """
-    Kalman Filter for bounding box tracking
-    State: [x, y, w, h, vx, vy, vw, vh]
+    Kalman filters of all live tracks, stored as stacked arrays (one row per track)
+    so predict/update run as a few batched NumPy calls instead of one filter object per track
     """
-    count = 0
-    
-    def __init__(self, bbox):
-        """bbox: [x1, y1, x2, y2]"""
-        self.kf = KalmanFilter(dim_x=8, dim_z=4)
-        
-        # State transition matrix
-        self.kf.F = np.array([
-            [1, 0, 0, 0, 1, 0, 0, 0],
-            [0, 1, 0, 0, 0, 1, 0, 0],
-            [0, 0, 1, 0, 0, 0, 1, 0],
-            [0, 0, 0, 1, 0, 0, 0, 1],
-            [0, 0, 0, 0, 1, 0, 0, 0],
-            [0, 0, 0, 0, 0, 1, 0, 0],
-            [0, 0, 0, 0, 0, 0, 1, 0],
-            [0, 0, 0, 0, 0, 0, 0, 1]
-        ])
-        
-        # Measurement matrix
-        self.kf.H = np.array([
-            [1, 0, 0, 0, 0, 0, 0, 0],
-            [0, 1, 0, 0, 0, 0, 0, 0],
-            [0, 0, 1, 0, 0, 0, 0, 0],
-            [0, 0, 0, 1, 0, 0, 0, 0]
-        ])
-        
-        # Covariance matrices
-        self.kf.R *= 10.0
-        self.kf.P[4:, 4:] *= 1000.0
-        self.kf.Q[4:, 4:] *= 0.01
-        
-        # Initialize state
-        self.kf.x[:4] = self._convert_bbox_to_z(bbox)
-        
-        self.time_since_update = 0
-        self.id = KalmanBoxTracker.count
-        KalmanBoxTracker.count += 1
-        self.history = []
-        self.hits = 0
-        self.hit_streak = 0
-        self.age = 0
-        
-    def _convert_bbox_to_z(self, bbox):
-        """Convert [x1, y1, x2, y2] to [cx, cy, w, h]"""
-        w = bbox[2] - bbox[0]
-        h = bbox[3] - bbox[1]
-        cx = bbox[0] + w / 2.0
-        cy = bbox[1] + h / 2.0
-        return np.array([cx, cy, w, h]).reshape((4, 1))
-    
-    def _convert_z_to_bbox(self, z):
-        """Convert [cx, cy, w, h] to [x1, y1, x2, y2]"""
-        w = z[2]
-        h = z[3]
-        x1 = z[0] - w / 2.0
-        y1 = z[1] - h / 2.0
-        x2 = z[0] + w / 2.0
-        y2 = z[1] + h / 2.0
-        return np.array([x1, y1, x2, y2])
-    
-    def update(self, bbox):
-        """Update tracker with new detection"""
-        self.time_since_update = 0
-        self.history = []
-        self.hits += 1
-        self.hit_streak += 1
-        self.kf.update(self._convert_bbox_to_z(bbox))
-    
-    def predict(self):
-        """Predict next state"""
-        if self.kf.x[2] + self.kf.x[3] <= 0:
-            self.kf.x[2] = 1
-        
-        self.kf.predict()
+
+    def __init__(self):
+        self.X = np.zeros((0, 8))           # states
+        self.P = np.zeros((0, 8, 8))        # state covariances
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.hit_streak = np.zeros(0, dtype=np.int64)
+        self.age = np.zeros(0, dtype=np.int64)
+        self.time_since_update = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.X)
+
+    def add(self, bboxes):
+        """Start a track per [x1, y1, x2, y2] row"""
+        z = _bbox_to_z(bboxes)
+        k = len(z)
+        if k == 0:
+            return
+
+        x = np.zeros((k, 8))
+        x[:, :4] = z
+        zeros = np.zeros(k, dtype=np.int64)
+        self.X = np.concatenate([self.X, x])
+        self.P = np.concatenate([self.P, np.broadcast_to(KF_P0, (k, 8, 8))])
+        self.ids = np.concatenate([self.ids, _next_track_ids(k)])
+        self.hits = np.concatenate([self.hits, zeros])
+        self.hit_streak = np.concatenate([self.hit_streak, zeros])
+        self.age = np.concatenate([self.age, zeros])
+        self.time_since_update = np.concatenate([self.time_since_update, zeros])
+
+    def keep(self, mask):
+        """Drop every track whose mask entry is False"""
+        # nothing to drop on most frames: keep the arrays instead of copying all seven
+        if mask.all():
+            return
+
+        self.X = self.X[mask]
+        self.P = self.P[mask]
+        self.ids = self.ids[mask]
+        self.hits = self.hits[mask]
+        self.hit_streak = self.hit_streak[mask]
+        self.age = self.age[mask]
+        self.time_since_update = self.time_since_update[mask]
+
+    def predict_all(self):
+        """
+        Predict the next state of every track
+
+        Returns:
+            (T, 4) array of predicted [x1, y1, x2, y2]
+        """
+        X, P = self.X, self.P
+
+        X[X[:, 2] + X[:, 3] <= 0, 2] = 1
+
+        # F = [[I, I], [0, I]]: x = F x is position += velocity, and
+        # P = F P F^T + Q unrolled on the 4x4 blocks (F is mostly zeros)
+        X[:, :4] += X[:, 4:]
+
+        # in place on views, no per-frame (T, 8, 8) allocation; P11 first, it reads the old P12/P21
+        P11, P12 = P[:, :4, :4], P[:, :4, 4:]
+        P21, P22 = P[:, 4:, :4], P[:, 4:, 4:]
+        P11 += P12
+        P11 += P21
+        P11 += P22
+        P12 += P22
+        P21 += P22
+        P += KF_Q
+
         self.age += 1
-        
-        if self.time_since_update > 0:
-            self.hit_streak = 0
-        
+        self.hit_streak[self.time_since_update > 0] = 0
         self.time_since_update += 1
-        self.history.append(self._convert_z_to_bbox(self.kf.x[:4]))
-        
-        return self.history[-1]
-    
-    def get_state(self):
-        """Get current bounding box"""
-        return self._convert_z_to_bbox(self.kf.x[:4])
+
+        return self.boxes()
+
+    def update(self, idx, bboxes):
+        """
+        Correct the tracks at idx with their matched detections
+
+        Args:
+            idx: Track rows (unique)
+            bboxes: Matching rows of [x1, y1, x2, y2]
+        """
+        X = self.X[idx]
+        P = self.P[idx]
+
+        # H selects the first four state entries: H P H^T = P[:4, :4], P H^T = P[:, :4]
+        y = _bbox_to_z(bboxes) - X[:, :4]
+        S = P[:, :4, :4] + KF_R
+
+        # K = P H^T S^-1, solved per track (S is symmetric)
+        K = np.linalg.solve(S, P[:, :4, :]).transpose(0, 2, 1)
+
+        self.X[idx] = X + np.einsum('kij,kj->ki', K, y)
+        self.P[idx] = P - K @ P[:, :4, :]
+
+        self.time_since_update[idx] = 0
+        self.hits[idx] += 1
+        self.hit_streak[idx] += 1
+
+    def boxes(self):
+        """Current [x1, y1, x2, y2] of every track"""
+        return _z_to_bbox(self.X[:, :4])
 
 
 def iou(bbox1, bbox2):
@@ -119,6 +213,63 @@ def iou(bbox1, bbox2):
     return inter_area / union_area if union_area > 0 else 0
 
 
+def iou_batch(a, b):
+    """
+    Pairwise IoU with NumPy broadcasting (all pairs in one vectorized pass)
+
+    Args:
+        a: (N, 4) array of [x1, y1, x2, y2]
+        b: (M, 4) array of [x1, y1, x2, y2]
+
+    Returns:
+        (N, M) IoU matrix
+    """
+    xx1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    yy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    xx2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    yy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+
+    inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+
+    return inter / np.where(union > 0, union, 1)
+
+
+def iou_pairs(a, b):
+    """(N, M) IoU matrix from the numba kernel when available, else NumPy broadcasting"""
+    a = np.ascontiguousarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.ascontiguousarray(b, dtype=np.float32).reshape(-1, 4)
+    if iou_matrix_nb is not None:
+        return iou_matrix_nb(a, b)
+    return iou_batch(a, b)
+
+
+def linear_assignment(iou_matrix, iou_threshold):
+    """
+    One-to-one maximum-IoU matching of detections (rows) to tracks (columns)
+
+    Uses lap.lapjv (Jonker-Volgenant) with a cost limit, so pairs below the
+    threshold are pruned inside the solver; scipy's Hungarian is the fallback.
+
+    Returns:
+        (K, 2) int array of [detection, track] pairs with IoU >= iou_threshold
+    """
+    if lap is not None:
+        _, x, _ = lap.lapjv(1.0 - iou_matrix.astype(np.float64), extend_cost=True,
+                            cost_limit=1.0 - iou_threshold)
+        dets = np.flatnonzero(x >= 0)
+        matches = np.stack([dets, x[dets]], axis=1)
+    else:
+        rows, cols = linear_sum_assignment(-iou_matrix)
+        matches = np.stack([rows, cols], axis=1)
+
+    # exact >= at the boundary (cost_limit only prunes strictly worse pairs)
+    return matches[iou_matrix[matches[:, 0], matches[:, 1]] >= iou_threshold]
+
+
 class ByteTrack:
     """
     ByteTrack: Multi-Object Tracker
@@ -136,7 +287,7 @@ class ByteTrack:
         self.min_hits = min_hits
         self.iou_threshold = iou_threshold
         
-        self.trackers = []
+        self.pool = TrackerPool()
         self.frame_count = 0
         
         logger.info(f"ByteTrack initialized: max_age={max_age}, min_hits={min_hits}, iou={iou_threshold}")
@@ -145,96 +296,88 @@ class ByteTrack:
         """
         Update tracker with new detections
         
+        Args:
+            detections: PersonDetector array, rows of [x1, y1, x2, y2, confidence]
+        
         Returns:
-            List of tracked objects with 'bbox', 'tracking_id', 'confidence'
+            Structured array (TRACK_DTYPE) with one row per confirmed track:
+            'id' (tracking ID), 'x1', 'y1', 'x2', 'y2', 'conf', 'cls'
         """
         self.frame_count += 1
         
-        # Predict existing trackers
-        predicted_bboxes = []
-        to_delete = []
+        pool = self.pool
         
-        for i, tracker in enumerate(self.trackers):
-            bbox = tracker.predict()
-            
-            if np.any(np.isnan(bbox)):
-                to_delete.append(i)
-            else:
-                predicted_bboxes.append(bbox)
+        # Predict all trackers in one batched step
+        predicted_bboxes = pool.predict_all()
         
-        # Remove invalid trackers
-        for i in reversed(to_delete):
-            self.trackers.pop(i)
+        # Remove invalid trackers (NaN or inf anywhere in the prediction, one call for all rows)
+        valid = np.isfinite(predicted_bboxes).all(axis=1)
+        if not valid.all():
+            pool.keep(valid)
+            predicted_bboxes = predicted_bboxes[valid]
+        
+        # Reported confidence per track row (0.5 when no detection overlaps it)
+        confs = np.full(len(pool), 0.5, dtype=np.float32)
         
         # Match detections to trackers
         if len(detections) > 0:
-            detection_bboxes = np.array([det['bbox'] for det in detections])
+            detection_bboxes = detections[:, :4]
             
-            if len(self.trackers) > 0:
-                iou_matrix = np.zeros((len(detection_bboxes), len(self.trackers)))
-                
-                for d, det_bbox in enumerate(detection_bboxes):
-                    for t, tracker in enumerate(self.trackers):
-                        iou_matrix[d, t] = iou(det_bbox, tracker.get_state())
+            if len(pool) > 0:
+                iou_matrix = iou_pairs(detection_bboxes, predicted_bboxes)
                 
-                # Hungarian algorithm
-                matched_indices = linear_sum_assignment(-iou_matrix)
-                matched_indices = np.array(list(zip(*matched_indices)))
+                # Confidence of each track's best-overlapping detection, from the same matrix
+                best = iou_matrix.argmax(axis=0)
+                overlapping = iou_matrix[best, np.arange(len(pool))] > 0.3
+                confs[overlapping] = detections[best[overlapping], 4]
                 
-                # Filter by IoU threshold
-                matches = []
-                for m in matched_indices:
-                    if iou_matrix[m[0], m[1]] >= self.iou_threshold:
-                        matches.append(m)
+                # Assignment, already filtered by IoU threshold
+                matches = linear_assignment(iou_matrix, self.iou_threshold)
                 
-                # Update matched trackers
-                matched_dets = []
-                for m in matches:
-                    self.trackers[m[1]].update(detection_bboxes[m[0]])
-                    matched_dets.append(m[0])
+                # Update matched trackers (one batched Kalman correction)
+                matched_dets = np.zeros(len(detection_bboxes), dtype=bool)
+                if len(matches) > 0:
+                    pool.update(matches[:, 1], detection_bboxes[matches[:, 0]])
+                    matched_dets[matches[:, 0]] = True
+                    # a matched track reports its own detection
+                    confs[matches[:, 1]] = detections[matches[:, 0], 4]
                 
                 # Create new trackers for unmatched detections
-                for i in range(len(detection_bboxes)):
-                    if i not in matched_dets:
-                        tracker = KalmanBoxTracker(detection_bboxes[i])
-                        self.trackers.append(tracker)
+                pool.add(detection_bboxes[~matched_dets])
+                confs = np.concatenate([confs, detections[~matched_dets, 4]])
             else:
                 # No existing trackers, create new ones
-                for det_bbox in detection_bboxes:
-                    tracker = KalmanBoxTracker(det_bbox)
-                    self.trackers.append(tracker)
+                pool.add(detection_bboxes)
+                confs = detections[:, 4].astype(np.float32)
         
         # Remove dead trackers
-        self.trackers = [
-            t for t in self.trackers 
-            if t.time_since_update <= self.max_age
-        ]
+        alive = pool.time_since_update <= self.max_age
+        pool.keep(alive)
+        confs = confs[alive]
         
         # Return confirmed tracks
-        tracked_objects = []
-        for tracker in self.trackers:
-            if tracker.hit_streak >= self.min_hits or self.frame_count <= self.min_hits:
-                bbox = tracker.get_state()
-                
-                # Find corresponding detection for confidence
-                conf = 0.5
-                for det in detections:
-                    if iou(bbox, det['bbox']) > 0.3:
-                        conf = det['confidence']
-                        break
-                
-                tracked_objects.append({
-                    'bbox': [int(bbox[0]), int(bbox[1]), int(bbox[2]), int(bbox[3])],
-                    'tracking_id': tracker.id + 1,
-                    'confidence': conf,
-                    'class': 'person'
-                })
+        confirmed = (pool.hit_streak >= self.min_hits) | (self.frame_count <= self.min_hits)
+        
+        tracked_objects = np.zeros(int(confirmed.sum()), dtype=TRACK_DTYPE)
+        if len(tracked_objects) == 0:
+            return tracked_objects
+        
+        boxes = pool.boxes()[confirmed]
+        
+        tracked_objects['id'] = pool.ids[confirmed] + 1
+        # integer pixel coordinates (truncated), same as the previous dict output
+        coords = np.trunc(boxes)
+        tracked_objects['x1'] = coords[:, 0]
+        tracked_objects['y1'] = coords[:, 1]
+        tracked_objects['x2'] = coords[:, 2]
+        tracked_objects['y2'] = coords[:, 3]
+        tracked_objects['conf'] = confs[confirmed]
+        tracked_objects['cls'] = 0
         
         return tracked_objects
     
     def reset(self):
         """Reset tracker"""
-        self.trackers = []
+        self.pool = TrackerPool()
         self.frame_count = 0
-        KalmanBoxTracker.count = 0
         logger.info("ByteTrack reset")
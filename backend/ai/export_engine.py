@@ -0,0 +1,198 @@
+from ultralytics import YOLO
+import argparse
+import glob
+import os
+import shutil
+
+# Paths
+WEIGHTS_PATH = os.path.join("models", "yolov8n.pt")
+FP16_ENGINE_PATH = os.path.join("models", "yolov8n.engine")
+INT8_ENGINE_PATH = os.path.join("models", "yolov8n_int8.engine")
+# Ultralytics names the OpenVINO INT8 export folder after the weights
+OPENVINO_INT8_DIR = os.path.join("models", "yolov8n_int8_openvino_model")
+
+# Largest acceptable relative mAP50-95 loss of the INT8 engine vs the FP16 reference
+MAX_INT8_MAP_DROP = 0.02
+
+
+def person_map(model_path, val_data):
+    """mAP50-95 of the person class on a labelled validation set"""
+    metrics = YOLO(model_path, task="detect").val(data=val_data, imgsz=320, batch=1,
+                                                   classes=[0], verbose=False, plots=False)
+    return float(metrics.box.map)
+
+
+def check_int8_accuracy(val_data):
+    """
+    Compare the INT8 engine against FP16 (the FP16 engine if built, else the .pt weights)
+
+    Returns:
+        True if the INT8 engine is within MAX_INT8_MAP_DROP, else False
+    """
+    reference = FP16_ENGINE_PATH if os.path.exists(FP16_ENGINE_PATH) else WEIGHTS_PATH
+
+    print(f"🔎 Validating INT8 engine against {reference} on {val_data}...")
+    ref_map = person_map(reference, val_data)
+    int8_map = person_map(INT8_ENGINE_PATH, val_data)
+
+    drop = (ref_map - int8_map) / ref_map if ref_map > 0 else 0.0
+    print(f"   person mAP50-95: reference={ref_map:.4f} int8={int8_map:.4f} (drop {drop * 100:.2f}%)")
+
+    return drop <= MAX_INT8_MAP_DROP
+
+
+def write_calib_yaml(calib_dir):
+    """
+    Ultralytics reads calibration images through a dataset yaml (labels are not needed)
+
+    Returns:
+        Path of the yaml, or None if calib_dir holds no JPEG frames
+    """
+    calib_images = glob.glob(os.path.join(calib_dir, "*.jpg"))
+    if not calib_images:
+        print(f"❌ No calibration frames found in: {calib_dir}/*.jpg")
+        return None
+
+    print(f"📷 Calibrating on {len(calib_images)} frames from {calib_dir}/")
+
+    calib_yaml = os.path.join(calib_dir, "calib.yaml")
+    with open(calib_yaml, "w") as f:
+        f.write(f"path: {os.path.abspath(calib_dir)}\n")
+        f.write("train: .\n")
+        f.write("val: .\n")
+        f.write("names:\n  0: person\n")
+
+    return calib_yaml
+
+
+def export_openvino(calib_dir="calib"):
+    """
+    Build an OpenVINO INT8 model for CPU-only servers (VNNI / AMX on x86, dot-product on ARM)
+
+    Args:
+        calib_dir: Folder of JPEG frames captured from the real cameras (~500 recommended)
+
+    Returns:
+        Path of the model folder, or None if the export failed
+    """
+    print("=" * 60)
+    print("⚙️ Exporting YOLOv8n to OpenVINO (INT8, CPU)...")
+    print("=" * 60)
+
+    if not os.path.exists(WEIGHTS_PATH):
+        print(f"❌ Weights not found: {WEIGHTS_PATH}")
+        return None
+
+    calib_yaml = write_calib_yaml(calib_dir)
+    if calib_yaml is None:
+        return None
+
+    # Same as: yolo export model=models/yolov8n.pt format=openvino int8=True data=calib/calib.yaml imgsz=320
+    # NNCF post-training quantization; dynamic batch so both cameras share one request
+    YOLO(WEIGHTS_PATH).export(format="openvino", int8=True, data=calib_yaml, imgsz=320, dynamic=True,
+                              batch=2, fraction=1.0)
+
+    if not os.path.isdir(OPENVINO_INT8_DIR):
+        print(f"⚠️ Export finished but model folder not found at {OPENVINO_INT8_DIR}")
+        return None
+
+    print(f"✅ OpenVINO model saved to: {OPENVINO_INT8_DIR}")
+    return OPENVINO_INT8_DIR
+
+
+def export_engine(int8=False, calib_dir="calib", val_data=None):
+    """
+    Build a TensorRT engine from models/yolov8n.pt (imgsz 320, dynamic batch up to 2)
+
+    Args:
+        int8: INT8 quantization calibrated on frames in calib_dir (FP16 fallback for unsupported layers)
+        calib_dir: Folder of JPEG frames captured from the real cameras (~500 recommended)
+        val_data: Labelled dataset yaml for the INT8 accuracy check (skipped when None)
+
+    Returns:
+        Path of the engine, or None if the export failed
+    """
+    precision = "INT8" if int8 else "FP16"
+    engine_path = INT8_ENGINE_PATH if int8 else FP16_ENGINE_PATH
+
+    print("=" * 60)
+    print(f"⚙️ Exporting YOLOv8n to TensorRT ({precision})...")
+    print("=" * 60)
+
+    if not os.path.exists(WEIGHTS_PATH):
+        print(f"❌ Weights not found: {WEIGHTS_PATH}")
+        return None
+
+    export_args = dict(format="engine", half=True, imgsz=320, dynamic=True, batch=2, device=0)
+
+    if int8:
+        calib_yaml = write_calib_yaml(calib_dir)
+        if calib_yaml is None:
+            return None
+
+        # Entropy calibration cache is written next to the engine and reused on re-export
+        export_args.update(int8=True, data=calib_yaml, fraction=1.0)
+
+    # Same as: yolo export model=models/yolov8n.pt format=engine half=True imgsz=320 dynamic=True batch=2 device=0
+    # (trtexec alternative: trtexec --onnx=yolov8n.onnx --saveEngine=yolov8n.engine --fp16
+    #  --minShapes=images:1x3x320x320 --optShapes=images:2x3x320x320 --maxShapes=images:2x3x320x320
+    #  add --int8 --calib=calib.cache for the INT8 build)
+    # Dynamic batch up to 2 lets both cameras share one forward pass
+    # Ultralytics always writes yolov8n.engine: park an existing FP16 engine during an INT8 build
+    fp16_backup = FP16_ENGINE_PATH + ".bak"
+    if int8 and os.path.exists(FP16_ENGINE_PATH):
+        shutil.move(FP16_ENGINE_PATH, fp16_backup)
+
+    try:
+        model = YOLO(WEIGHTS_PATH)
+        exported = model.export(**export_args)
+
+        # keep the INT8 build under its own name
+        if int8 and os.path.exists(FP16_ENGINE_PATH):
+            shutil.move(FP16_ENGINE_PATH, engine_path)
+    finally:
+        if os.path.exists(fp16_backup):
+            shutil.move(fp16_backup, FP16_ENGINE_PATH)
+
+    if not os.path.exists(engine_path):
+        print(f"⚠️ Export finished but engine not found at {engine_path} (got: {exported})")
+        return None
+
+    print(f"✅ Engine saved to: {engine_path}")
+
+    # PTQ accuracy gate: without the INT8 engine the server falls back to FP16
+    if int8 and val_data:
+        if not check_int8_accuracy(val_data):
+            os.remove(engine_path)
+            print(f"❌ INT8 accuracy drop above {MAX_INT8_MAP_DROP * 100:.0f}%, removed {engine_path}")
+            return None
+        print("✅ INT8 accuracy check passed")
+    elif int8:
+        print("⚠️ No --val-data given, INT8 accuracy was not checked")
+
+    print("=" * 60)
+    print("✅ Export Complete!")
+    print("=" * 60)
+
+    return engine_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export YOLOv8n to a TensorRT engine (or an OpenVINO INT8 model)")
+    parser.add_argument("--int8", action="store_true",
+                        help="INT8 quantization calibrated on frames in calib/ (FP16 fallback for unsupported layers)")
+    parser.add_argument("--openvino", action="store_true",
+                        help="Build an OpenVINO INT8 model for CPU-only servers instead of a TensorRT engine")
+    parser.add_argument("--calib-dir", default="calib",
+                        help="Folder of JPEG frames captured from the real cameras (~500 recommended)")
+    parser.add_argument("--val-data", default=None,
+                        help="Labelled held-out dataset yaml; the INT8 engine is discarded if person mAP drops >2%%")
+    args = parser.parse_args()
+
+    if args.openvino:
+        result = export_openvino(calib_dir=args.calib_dir)
+    else:
+        result = export_engine(int8=args.int8, calib_dir=args.calib_dir, val_data=args.val_data)
+
+    if result is None:
+        raise SystemExit(1)
@@ -282,8 +282,12 @@ function updateStats(data) {
     // Update detection list (every 15 seconds to prevent scroll jump)
     const now = Date.now();
     if (!window.lastDetectionUpdate || now - window.lastDetectionUpdate > 15000) {
-        if (data.all_detections && data.all_detections.length > 0) {
-            updateDetectionsList(data.all_detections);
+        const allDetections = [
+            ...zipDetections(data.camera1?.detections, 'Camera 1'),
+            ...zipDetections(data.camera2?.detections, 'Camera 2')
+        ];
+        if (allDetections.length > 0) {
+            updateDetectionsList(allDetections);
         } else {
             showEmptyDetections();
         }
@@ -291,6 +295,17 @@ function updateStats(data) {
     }
 }
 
+// Stats carry detections as parallel arrays (ids, x1, y1, x2, y2, confs); rebuild rows
+function zipDetections(soa, camera) {
+    if (!soa || !soa.ids) return [];
+    return soa.ids.map((id, i) => ({
+        camera: camera,
+        tracking_id: id,
+        confidence: soa.confs[i],
+        bbox: [soa.x1[i], soa.y1[i], soa.x2[i], soa.y2[i]]
+    }));
+}
+
 function updateDetectionsList(detections) {
     const list = document.getElementById('detectionsList');
     
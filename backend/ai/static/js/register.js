@@ -121,6 +121,30 @@ function parseItinerary(itineraryText) {
     return itinerary;
 }
 
+// Poll a queued registration until it is written (or fails)
+async function waitForRegistration(job, intervalMs = 500, timeoutMs = 30000) {
+    const deadline = Date.now() + timeoutMs;
+
+    while (Date.now() < deadline) {
+        const response = await fetch(`/api/register_status/${encodeURIComponent(job)}`);
+        const status = await response.json();
+
+        if (!response.ok) {
+            throw new Error(status.error || 'Registration status unavailable');
+        }
+        if (status.status === 'done') {
+            return status;
+        }
+        if (status.status === 'failed') {
+            throw new Error(status.error || 'Registration failed');
+        }
+
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+
+    throw new Error('Registration is taking too long, please check again later');
+}
+
 // Handle form submission
 document.getElementById('registrationForm').addEventListener('submit', async (e) => {
     e.preventDefault();
@@ -172,6 +196,12 @@ document.getElementById('registrationForm').addEventListener('submit', async (e)
         const result = await response.json();
         
         if (response.ok && result.success) {
+            // 202: the DID is assigned but the encrypted write is still queued
+            if (result.queued) {
+                submitBtn.innerHTML = '⏳ Saving registration...';
+                await waitForRegistration(result.job);
+            }
+
             console.log('✅ Registration successful:', result);
             
             // Show success modal with DID and QR code
@@ -0,0 +1,57 @@
+"""
+Fast JSON - orjson-backed drop-in for the stdlib json module
+Handed to Flask-SocketIO so every emitted payload is serialized in C
+"""
+import json as _json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# numpy scalars/arrays may show up in detection payloads
+_ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def dumps(obj, **kwargs):
+    """
+    Serialize obj to a JSON string
+
+    Keyword arguments (separators, indent, ...) are accepted for
+    compatibility with callers expecting the stdlib signature and ignored
+    by orjson, which always emits compact output.
+
+    Returns:
+        JSON text (str)
+    """
+    if orjson is None:
+        return _json.dumps(obj, **kwargs)
+
+    try:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode('utf-8')
+    except TypeError:
+        # Types orjson refuses (e.g. subclasses with custom encoders)
+        return _json.dumps(obj, **kwargs)
+
+
+def dumpb(obj):
+    """
+    Serialize obj straight to UTF-8 JSON bytes (for Flask Response bodies)
+
+    Returns:
+        JSON bytes
+    """
+    if orjson is None:
+        return _json.dumps(obj).encode('utf-8')
+
+    try:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    except TypeError:
+        return _json.dumps(obj).encode('utf-8')
+
+
+def loads(s, **kwargs):
+    """Deserialize a JSON document (str or bytes)"""
+    if orjson is None:
+        return _json.loads(s, **kwargs)
+    return orjson.loads(s)
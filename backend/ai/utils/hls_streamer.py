@@ -0,0 +1,144 @@
+"""
+HLS Streamer - H.264 segments as a low-bandwidth alternative to MJPEG
+Annotated frames are piped as raw BGR into an ffmpeg subprocess that writes
+fMP4 HLS segments (NVENC on NVIDIA GPUs, libx264 otherwise)
+"""
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import cv2
+from loguru import logger
+
+
+def _nvenc_available():
+    """ffmpeg lists h264_nvenc and an NVIDIA driver is present"""
+    if shutil.which('nvidia-smi') is None:
+        return False
+    try:
+        encoders = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+                                  capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return 'h264_nvenc' in encoders
+
+
+class HLSStreamer:
+    PLAYLIST = 'index.m3u8'
+
+    def __init__(self, out_dir, frame_size, fps=25, segment_seconds=2, encoder='auto'):
+        """
+        Args:
+            out_dir: Folder for the playlist and segments (created if missing)
+            frame_size: (width, height) of the frames that will be pushed
+            fps: Output frame rate (input frames are timestamped on arrival)
+            segment_seconds: Target HLS segment duration
+            encoder: 'auto', 'h264_nvenc' or 'libx264'
+        """
+        self.out_dir = out_dir
+        self.frame_size = tuple(frame_size)
+        self.fps = fps
+        self.segment_seconds = segment_seconds
+
+        if encoder == 'auto':
+            encoder = 'h264_nvenc' if _nvenc_available() else 'libx264'
+        self.encoder = encoder
+
+        # single slot: the writer always pipes the newest frame, capture never waits on ffmpeg
+        self.frames = queue.Queue(maxsize=1)
+        self.process = None
+        self.thread = None
+        self._stop = threading.Event()
+
+    @property
+    def playlist_path(self):
+        return os.path.join(self.out_dir, self.PLAYLIST)
+
+    def _command(self):
+        width, height = self.frame_size
+
+        if self.encoder == 'h264_nvenc':
+            codec = ['-c:v', 'h264_nvenc', '-preset', 'p3', '-tune', 'll']
+        else:
+            codec = ['-c:v', 'libx264', '-preset', 'veryfast', '-tune', 'zerolatency']
+
+        gop = str(self.fps * self.segment_seconds)  # one keyframe per segment
+
+        return [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+            '-use_wallclock_as_timestamps', '1',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-i', '-',
+            *codec, '-pix_fmt', 'yuv420p', '-r', str(self.fps), '-g', gop, '-sc_threshold', '0',
+            '-f', 'hls', '-hls_time', str(self.segment_seconds), '-hls_list_size', '5',
+            '-hls_segment_type', 'fmp4',
+            '-hls_flags', 'delete_segments+independent_segments+omit_endlist',
+            self.playlist_path,
+        ]
+
+    def start(self):
+        """Launch ffmpeg and the writer thread"""
+        os.makedirs(self.out_dir, exist_ok=True)
+
+        self._stop.clear()
+        self.process = subprocess.Popen(self._command(), stdin=subprocess.PIPE)
+        self.thread = threading.Thread(target=self._writer, name="HLSWriter", daemon=True)
+        self.thread.start()
+
+        logger.info(f"HLS streamer started: encoder={self.encoder}, {self.frame_size[0]}x{self.frame_size[1]} "
+                    f"@ {self.fps} FPS -> {self.playlist_path}")
+
+    def push(self, frame):
+        """Hand an annotated BGR frame to the encoder (drops the previous one if still pending)"""
+        if self._stop.is_set():
+            return
+        try:
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.frames.put_nowait(frame)
+            except queue.Full:
+                pass
+
+    def _writer(self):
+        """Pipe frames into ffmpeg while the previous one is being encoded"""
+        width, height = self.frame_size
+
+        while not self._stop.is_set():
+            try:
+                frame = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if frame.shape[1] != width or frame.shape[0] != height:
+                frame = cv2.resize(frame, self.frame_size)
+            elif not frame.flags['C_CONTIGUOUS']:
+                frame = frame.copy()
+
+            try:
+                self.process.stdin.write(memoryview(frame).cast('B'))
+            except (BrokenPipeError, ValueError, OSError) as e:
+                logger.error(f"HLS encoder exited ({self.encoder}): {e}")
+                self._stop.set()
+
+    def stop(self):
+        """Stop the writer and let ffmpeg finalize the last segment"""
+        self._stop.set()
+
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+        if self.process is not None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+            self.process = None
+
+        logger.info(f"HLS streamer stopped ({self.playlist_path})")
@@ -0,0 +1,51 @@
+"""
+Rate-Limited Logger - sampled loguru output for per-frame error handlers
+A failure that repeats on every frame logs one traceback per interval
+instead of 30 per second
+"""
+import threading
+import time
+from loguru import logger
+
+
+class RateLimitedLogger:
+    def __init__(self, interval=5.0):
+        """
+        Args:
+            interval: Minimum seconds between two messages with the same key
+        """
+        self.interval = interval
+        self._state = {}  # key -> (last emit time, suppressed count)
+        self._lock = threading.Lock()
+
+    def _should_log(self, key):
+        """
+        Returns:
+            (emit, suppressed): whether to log now and how many were dropped since the last one
+        """
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._state.get(key, (None, 0))
+            if last is not None and now - last < self.interval:
+                self._state[key] = (last, suppressed + 1)
+                return False, 0
+            self._state[key] = (now, 0)
+        return True, suppressed
+
+    def exception(self, key, message, *args):
+        """logger.exception (with traceback), at most once per interval for key"""
+        emit, suppressed = self._should_log(key)
+        if not emit:
+            return
+        if suppressed:
+            message = f"{message} (suppressed {suppressed})"
+        logger.opt(depth=1).exception(message, *args)
+
+    def warning(self, key, message, *args):
+        """logger.warning, at most once per interval for key"""
+        emit, suppressed = self._should_log(key)
+        if not emit:
+            return
+        if suppressed:
+            message = f"{message} (suppressed {suppressed})"
+        logger.opt(depth=1).warning(message, *args)
@@ -0,0 +1,115 @@
+"""
+Video Encoder - JPEG encoding for MJPEG streams
+Uses nvJPEG on NVIDIA GPUs, libjpeg-turbo (PyTurboJPEG) or OpenCV otherwise
+"""
+import cv2
+from loguru import logger
+
+try:
+    import torch
+    from torchvision.io import encode_jpeg
+except ImportError:
+    torch = None
+    encode_jpeg = None
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+except ImportError:
+    TurboJPEG = None
+
+
+class VideoEncoder:
+    def __init__(self, quality=70, low_quality=50, backend='auto'):
+        """
+        Initialize JPEG encoder
+
+        Args:
+            quality: JPEG quality (0-100)
+            low_quality: Quality used while the encoder is falling behind
+            backend: 'auto', 'nvjpeg', 'turbojpeg' or 'opencv'
+        """
+        self.quality = quality
+        self.low_quality = low_quality
+        self.turbo = None
+
+        # nvJPEG upload buffers, (re)allocated when the frame shape changes
+        self._host_frame = None
+        self._device_frame = None
+
+        if backend == 'auto':
+            if self._nvjpeg_available():
+                backend = 'nvjpeg'
+            elif TurboJPEG is not None:
+                backend = 'turbojpeg'
+            else:
+                backend = 'opencv'
+
+        if backend == 'turbojpeg':
+            try:
+                self.turbo = TurboJPEG()
+            except Exception as e:
+                # PyTurboJPEG installed but the libjpeg-turbo shared library is missing
+                logger.warning(f"TurboJPEG unavailable, using OpenCV: {e}")
+                backend = 'opencv'
+
+        self.backend = backend
+
+        logger.info(f"VideoEncoder initialized: backend={self.backend}, quality={self.quality}")
+
+    @staticmethod
+    def _nvjpeg_available():
+        """nvJPEG encode needs torchvision>=0.19 and a CUDA device"""
+        return encode_jpeg is not None and torch.cuda.is_available()
+
+    def encode(self, frame, quality=None):
+        """
+        Encode a BGR frame to JPEG
+
+        Args:
+            frame: OpenCV image (numpy array, BGR)
+            quality: Override the default quality for this frame
+
+        Returns:
+            JPEG bytes, or None if encoding failed
+        """
+        quality = quality or self.quality
+
+        if self.backend == 'nvjpeg':
+            try:
+                return self._encode_nvjpeg(frame, quality)
+            except Exception as e:
+                # Fall back for good rather than failing every frame
+                logger.warning(f"nvJPEG encode failed, falling back to OpenCV: {e}")
+                self.backend = 'opencv'
+
+        if self.backend == 'turbojpeg':
+            # SIMD libjpeg-turbo, encodes BGR without a color conversion copy;
+            # 4:2:0 explicitly (PyTurboJPEG defaults to 4:2:2): half the chroma to DCT
+            return self.turbo.encode(frame, quality=quality, pixel_format=TJPF_BGR,
+                                     jpeg_subsample=TJSAMP_420)
+
+        # cv2.imencode releases the GIL while libjpeg runs
+        ret, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality,
+                                                   cv2.IMWRITE_JPEG_SAMPLING_FACTOR,
+                                                   cv2.IMWRITE_JPEG_SAMPLING_FACTOR_420])
+        if not ret:
+            return None
+
+        return buffer.tobytes()
+
+    def _encode_nvjpeg(self, frame, quality):
+        """Upload the frame and encode it on the GPU with nvJPEG"""
+        if self._host_frame is None or tuple(self._host_frame.shape) != frame.shape:
+            self._host_frame = torch.empty(frame.shape, dtype=torch.uint8, pin_memory=True)
+            self._device_frame = torch.empty(frame.shape, dtype=torch.uint8, device='cuda')
+
+        # One memcpy into pinned memory, then a DMA upload into the reused device buffer
+        self._host_frame.numpy()[...] = frame
+        self._device_frame.copy_(self._host_frame, non_blocking=True)
+
+        # HWC BGR -> CHW RGB on the device, so the host only ships raw pixels
+        tensor = self._device_frame.flip(-1).permute(2, 0, 1).contiguous()
+
+        jpeg = encode_jpeg(tensor, quality=quality)
+
+        return jpeg.cpu().numpy().tobytes()
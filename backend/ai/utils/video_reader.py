@@ -1,22 +1,66 @@
 """
 Video Reader - Supports Webcam, MP4, ESP32-CAM, Phone IP Camera
 """
+import os
+import time
 import cv2
 from loguru import logger
 
+try:
+    import av
+    from av.codec.hwaccel import HWAccel
+except ImportError:
+    av = None
+
+# a grab() that returns faster than this came out of the backend's buffer
+BUFFERED_GRAB_SECONDS = 0.002
+MAX_DRAIN_GRABS = 4
+
+def cuda_decode_available():
+    """NVDEC decode needs an OpenCV build with CUDA and the cudacodec module"""
+    try:
+        return hasattr(cv2, 'cudacodec') and cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except Exception:
+        return False
+
+
+def gstreamer_available():
+    """OpenCV was built with the GStreamer videoio backend"""
+    for line in cv2.getBuildInformation().splitlines():
+        if line.strip().startswith('GStreamer:'):
+            return 'YES' in line
+    return False
+
+
 class VideoReader:
-    def __init__(self, source=0):
+    def __init__(self, source=0, target_size=None, use_cuda=True, use_opencl=False):
         """
         Initialize video reader
         
         Args:
             source: int (webcam), str (video file path, URL, or IP camera stream)
+            target_size: Optional (width, height) every returned frame should have
+            use_cuda: Decode files/RTSP with NVDEC and resize on the GPU when available
+            use_opencl: Resize CPU-decoded frames through OpenCL (cv2.UMat); opt-in, the
+                upload/download round trip can cost more than a SIMD resize on the CPU
         """
         self.source = source
+        self.target_size = target_size
+        self.use_cuda = use_cuda
+        # honors OPENCV_OPENCL_DEVICE=disabled / cv2.ocl.setUseOpenCL(False) as well
+        self.use_opencl = use_opencl and cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
         self.cap = None
+        self.gpu_reader = None
+        self.av_container = None
+        self._av_frames = None
         self.fps = 0
         self.width = 0
         self.height = 0
+        self._needs_resize = False
+        self.is_live = self._is_live_source()
+        
+        # reused decode target when a resize follows; never handed out, so it is safe to overwrite
+        self._raw = None
         
         self._open()
     
@@ -24,14 +68,41 @@ class VideoReader:
         """Open video source"""
         logger.info(f"Opening video source: {self.source}")
         
+        # Files and RTSP streams can be decoded straight into GPU memory
+        if self.use_cuda and self._is_cuda_decodable() and cuda_decode_available():
+            try:
+                self._open_cuda()
+                return
+            except Exception as e:
+                logger.warning(f"NVDEC open failed, falling back to CPU decode: {e}")
+                self.gpu_reader = None
+        
+        # OpenCV without cudacodec: NVDEC through PyAV/FFmpeg (hwaccel=cuda) instead
+        elif self.use_cuda and self._is_cuda_decodable() and av is not None:
+            try:
+                self._open_av()
+                return
+            except Exception as e:
+                logger.warning(f"PyAV NVDEC open failed, falling back to OpenCV decode: {e}")
+                self._close_av()
+        
+        # Neither: GStreamer's decodebin autoplugs nvh264dec/nvh265dec (or VA-API) when installed
+        elif self.use_cuda and self._is_cuda_decodable() and gstreamer_available():
+            self.cap = cv2.VideoCapture(self._gst_pipeline(), cv2.CAP_GSTREAMER)
+            if not self.cap.isOpened():
+                logger.warning("GStreamer decode open failed, falling back to OpenCV decode")
+                self.cap = None
+        
         # Handle different source types
-        if isinstance(self.source, str):
-            # Check if it's an IP camera stream
-            if self.source.startswith('http://') or self.source.startswith('rtsp://'):
-                # For IP cameras, use CAP_FFMPEG backend
-                self.cap = cv2.VideoCapture(self.source, cv2.CAP_FFMPEG)
-            else:
-                # Regular file
+        if self.cap is not None:
+            logger.info("Decoding through GStreamer (hardware decoder if available)")
+        elif isinstance(self.source, str):
+            # Files and IP streams go through FFMPEG with any available hardware decoder
+            # (VAAPI / D3D11 / MFX); OpenCV silently uses software decode otherwise
+            hw_params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+            self.cap = cv2.VideoCapture(self.source, cv2.CAP_FFMPEG, hw_params)
+            if not self.cap.isOpened():
+                # e.g. image sequences / formats only another backend can open
                 self.cap = cv2.VideoCapture(self.source)
         else:
             # Webcam index
@@ -40,34 +111,215 @@ class VideoReader:
         if not self.cap.isOpened():
             raise ValueError(f"Cannot open video source: {self.source}")
         
+        # Live sources: keep at most one frame queued (honored by V4L2/GStreamer/FFMPEG)
+        if self.is_live:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        
         # Get video properties
         self.fps = self.cap.get(cv2.CAP_PROP_FPS)
-        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
         # For IP streams, FPS might be 0, set default
         if self.fps == 0:
             self.fps = 30.0
         
+        if self.target_size:
+            self.set_target_size(*self.target_size)
+        else:
+            self._update_size()
+        
         logger.success(f"Video opened: {self.width}x{self.height} @ {self.fps} FPS")
+        if self._needs_resize:
+            logger.info(f"Resizing to {self.target_size} on {'OpenCL' if self.use_opencl else 'CPU'}")
+    
+    def set_target_size(self, width, height):
+        """
+        Deliver frames at (width, height)
+        Webcams are asked to capture at that resolution directly; anything that
+        cannot be scaled at capture time is resized once per frame in read()
+        """
+        self.target_size = (width, height)
+        
+        if self.gpu_reader is not None or self.av_container is not None:
+            self._needs_resize = (self.width, self.height) != self.target_size
+            return
+        
+        if not isinstance(self.source, str):
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        
+        self._update_size()
+    
+    def _update_size(self):
+        """Re-read the capture size and decide whether read() must resize"""
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        
+        if self.target_size:
+            self._needs_resize = (self.width, self.height) != tuple(self.target_size)
+    
+    @property
+    def _interpolation(self):
+        """Area averaging when shrinking (no aliasing, SIMD path in OpenCV), bilinear when enlarging"""
+        if self.target_size and self.width >= self.target_size[0] and self.height >= self.target_size[1]:
+            return cv2.INTER_AREA
+        return cv2.INTER_LINEAR
+    
+    def _is_live_source(self):
+        """Webcams and network streams (files must not drop frames)"""
+        if not isinstance(self.source, str):
+            return True
+        return self.source.startswith(('http://', 'https://', 'rtsp://'))
+    
+    def _is_cuda_decodable(self):
+        """Only files and RTSP go through NVDEC (webcams / HTTP MJPEG stay on the CPU)"""
+        return isinstance(self.source, str) and not self.source.startswith('http://')
+    
+    def _gst_pipeline(self):
+        """GStreamer pipeline string: hardware-ranked decoder -> BGR appsink"""
+        uri = self.source
+        if '://' not in uri:
+            uri = 'file://' + os.path.abspath(uri)
+        
+        # live streams keep only the newest buffer; files must deliver every frame
+        sink = 'appsink drop=true max-buffers=1 sync=false' if self.is_live else 'appsink sync=false'
+        return f'uridecodebin uri={uri} ! videoconvert ! video/x-raw,format=BGR ! {sink}'
+    
+    def _open_cuda(self):
+        """Open source with cv2.cudacodec (NVDEC), frames stay on the GPU until read() downloads them"""
+        self.gpu_reader = cv2.cudacodec.createVideoReader(self.source)
+        self.gpu_reader.set(cv2.cudacodec.ColorFormat_BGR)
+        
+        fmt = self.gpu_reader.format()
+        self.width = int(fmt.width)
+        self.height = int(fmt.height)
+        self.fps = float(getattr(fmt, 'fps', 0)) or 30.0
+        
+        if self.target_size:
+            self._needs_resize = (self.width, self.height) != tuple(self.target_size)
+        
+        logger.success(f"Video opened with NVDEC: {self.width}x{self.height} @ {self.fps} FPS")
+    
+    def _open_av(self):
+        """Open source with PyAV using FFmpeg's CUDA hwaccel (NVDEC), software decode if unsupported"""
+        options = {}
+        if self.source.startswith('rtsp://'):
+            options = {'rtsp_transport': 'tcp', 'fflags': 'nobuffer', 'flags': 'low_delay'}
+        
+        self.av_container = av.open(
+            self.source, options=options,
+            hwaccel=HWAccel(device_type='cuda', allow_software_fallback=True)
+        )
+        stream = self.av_container.streams.video[0]
+        stream.thread_type = 'AUTO'
+        
+        self.width = stream.codec_context.width
+        self.height = stream.codec_context.height
+        self.fps = float(stream.average_rate or 0) or 30.0
+        self._av_frames = self.av_container.decode(stream)
+        
+        if self.target_size:
+            self._needs_resize = (self.width, self.height) != tuple(self.target_size)
+        
+        logger.success(f"Video opened with PyAV (hwaccel=cuda): {self.width}x{self.height} @ {self.fps} FPS")
+    
+    def _close_av(self):
+        if self.av_container is not None:
+            self.av_container.close()
+        self.av_container = None
+        self._av_frames = None
+    
+    def _read_av(self):
+        """Decode the next frame; scale + convert to BGR in a single swscale pass"""
+        try:
+            frame = next(self._av_frames)
+        except (StopIteration, av.error.EOFError):
+            return False, None
+        
+        if self._needs_resize:
+            width, height = self.target_size
+            return True, frame.to_ndarray(width=width, height=height, format='bgr24')
+        
+        return True, frame.to_ndarray(format='bgr24')
     
     def read(self):
         """
         Read next frame
         
         Returns:
-            (success: bool, frame: numpy array)
+            (success: bool, frame: numpy array, at target_size if one was given)
+        """
+        if self.gpu_reader is not None:
+            return self._read_cuda()
+        
+        if self.av_container is not None:
+            return self._read_av()
+        
+        # Returned frames are owned by the caller: downstream stages hold them for an unbounded
+        # time (drop-oldest queues never slow capture down), so only the pre-resize scratch is reused
+        dst = self._raw if self._needs_resize else None
+        
+        if self.is_live:
+            ret, frame = self._read_latest(dst)
+        else:
+            ret, frame = self.cap.read(dst)
+        
+        if not ret:
+            return False, None
+        
+        if self._needs_resize:
+            self._raw = frame
+            width, height = self.target_size
+            if self.use_opencl:
+                # T-API: runs as an OpenCL kernel (zero-copy on integrated GPUs)
+                frame = cv2.resize(cv2.UMat(frame), (width, height), interpolation=self._interpolation).get()
+            else:
+                frame = cv2.resize(frame, (width, height), interpolation=self._interpolation)
+        
+        return ret, frame
+    
+    def _read_latest(self, dst=None):
         """
-        return self.cap.read()
+        Skip frames that piled up in the capture buffer while we were busy,
+        so live sources always hand back the newest frame instead of lagging
+        (decoded into dst when it has the right size)
+        """
+        # Buffered frames come back almost instantly; a fresh one waits for the sensor
+        for _ in range(MAX_DRAIN_GRABS + 1):
+            start = time.monotonic()
+            if not self.cap.grab():
+                return False, None
+            if time.monotonic() - start > BUFFERED_GRAB_SECONDS:
+                break
+        
+        return self.cap.retrieve(dst)
+    
+    def _read_cuda(self):
+        """Decode + color convert + resize on the GPU, then download only the small frame"""
+        ret, gpu_frame = self.gpu_reader.nextFrame()
+        if not ret:
+            return False, None
+        
+        if self._needs_resize:
+            gpu_frame = cv2.cuda.resize(gpu_frame, tuple(self.target_size), interpolation=self._interpolation)
+        
+        return True, gpu_frame.download()
     
     def release(self):
         """Release video capture"""
+        if self.gpu_reader is not None:
+            self.gpu_reader = None
+            logger.info("Video source released")
+        if self.av_container is not None:
+            self._close_av()
+            logger.info("Video source released")
         if self.cap:
             self.cap.release()
             logger.info("Video source released")
     
     def is_opened(self):
         """Check if video is opened"""
+        if self.gpu_reader is not None or self.av_container is not None:
+            return True
         return self.cap and self.cap.isOpened()
     
     def get_info(self):
@@ -0,0 +1,22 @@
+"""
+Production entry point
+Serves the app from eventlet's (or gevent's) own WSGI server in a single process
+(cameras and the detector live in-process):
+
+    python wsgi.py                       # ASYNC_MODE=eventlet
+    ASYNC_MODE=gevent python wsgi.py
+
+Do not run it under gunicorn's eventlet / gevent workers: they monkey-patch
+everything, threads included, before the app is imported, which turns the camera
+pipelines and the InferenceWorker into greenlets that block the hub during inference.
+Here app.py applies its selective patch (sockets/select only, thread=False, time=False).
+"""
+import os
+
+os.environ.setdefault("ASYNC_MODE", "eventlet")
+
+from app import app, socketio, init_services  # noqa: E402
+
+if __name__ == "__main__":
+    init_services()
+    socketio.run(app, host=os.environ.get("HOST", "0.0.0.0"), port=int(os.environ.get("PORT", "5000")))
@@ -10,8 +10,28 @@ from loguru import logger
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 import secrets
+import threading
 import json
 
+# imported as database.db_manager by the server, as db_manager by init_db.py
+try:
+    from .utils import compute_id_hash
+except ImportError:
+    from utils import compute_id_hash
+
+# AES-GCM nonce length (stored in front of each ciphertext)
+NONCE_SIZE = 12
+
+# One constant string: sqlite3's per-connection statement cache keys on the SQL text,
+# so every insert reuses the compiled statement
+INSERT_TOURIST_SQL = '''
+    INSERT INTO tourists (
+        did, id_hash, name_encrypted, id_type, id_number_encrypted,
+        phone_encrypted, email_encrypted, entry_point, itinerary_encrypted,
+        encryption_key_id
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
 
 class DatabaseManager:
     """Manages SQLite and MongoDB connections"""
@@ -20,6 +40,10 @@ class DatabaseManager:
         self.sqlite_path = sqlite_path
         self.conn = None
         self.master_key = None
+        self.aesgcm = None
+        
+        # One connection is shared by request threads and the persistence worker
+        self.lock = threading.Lock()
         
         # Create database directory if not exists
         os.makedirs(os.path.dirname(sqlite_path), exist_ok=True)
@@ -33,9 +57,16 @@ class DatabaseManager:
         logger.info(f"Initializing SQLite database: {self.sqlite_path}")
         
         # Create connection
-        self.conn = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+        self.conn = sqlite3.connect(self.sqlite_path, check_same_thread=False, cached_statements=256)
         self.conn.row_factory = sqlite3.Row
         
+        # WAL: readers never block on the background writer (and vice versa)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        # temp b-trees in RAM, reads through a 256 MB memory map instead of read() calls
+        self.conn.execute('PRAGMA temp_store=MEMORY')
+        self.conn.execute('PRAGMA mmap_size=268435456')
+        
         # Read and execute schema
         schema_path = Path(__file__).parent / 'sqlite' / 'schema.sql'
         with open(schema_path, 'r') as f:
@@ -60,27 +91,36 @@ class DatabaseManager:
             # Secure the file (chmod 600)
             os.chmod(key_path, 0o600)
         
+        # Key schedule set up once; AESGCM holds no per-message state, so one
+        # instance is shared by every thread
+        self.aesgcm = AESGCM(self.master_key)
+        
         logger.info("Encryption keys initialized")
     
-    def encrypt_data(self, plaintext):
-        """Encrypt data using AES-256-GCM"""
+    def encrypt_data(self, plaintext, nonce=None):
+        """
+        Encrypt data using AES-256-GCM
+        
+        Args:
+            plaintext: str or bytes
+            nonce: Fresh random 12 bytes (generated if None); never reuse one
+        """
         if isinstance(plaintext, str):
             plaintext = plaintext.encode('utf-8')
         
-        aesgcm = AESGCM(self.master_key)
-        nonce = secrets.token_bytes(12)
-        ciphertext = aesgcm.encrypt(nonce, plaintext, None)
+        if nonce is None:
+            nonce = secrets.token_bytes(NONCE_SIZE)
+        ciphertext = self.aesgcm.encrypt(nonce, plaintext, None)
         
         # Return nonce + ciphertext
         return nonce + ciphertext
     
     def decrypt_data(self, encrypted_data):
         """Decrypt data"""
-        aesgcm = AESGCM(self.master_key)
-        nonce = encrypted_data[:12]
-        ciphertext = encrypted_data[12:]
+        nonce = encrypted_data[:NONCE_SIZE]
+        ciphertext = encrypted_data[NONCE_SIZE:]
         
-        plaintext = aesgcm.decrypt(nonce, ciphertext, None)
+        plaintext = self.aesgcm.decrypt(nonce, ciphertext, None)
         return plaintext.decode('utf-8')
     
     def register_tourist(self, tourist_data):
@@ -97,35 +137,41 @@ class DatabaseManager:
                 - email: Email
                 - entry_point: Airport/Station code
                 - itinerary: List of travel plans
+                - id_hash: Optional precomputed ID hash (generated if missing)
         
         Returns:
-            tourist_id: Integer ID of registered tourist
+            (tourist_id, id_hash)
         """
-        import hashlib
+        row, id_hash = self._tourist_row(tourist_data)
+        
+        # Insert into database
+        with self.lock:
+            cursor = self.conn.execute(INSERT_TOURIST_SQL, row)
+            self.conn.commit()
+            tourist_id = cursor.lastrowid
+        
+        logger.success(f"Tourist registered: DID={tourist_data['did']}, ID={tourist_id}")
+        
+        return tourist_id, id_hash
+    
+    def _tourist_row(self, tourist_data):
+        """INSERT_TOURIST_SQL parameters (sensitive fields encrypted) and the ID hash"""
+        # Generate ID hash (callers that answer before the write supply their own)
+        id_hash = tourist_data.get('id_hash') or compute_id_hash(tourist_data['id_number'])[0]
         
-        # Generate ID hash
-        id_hash = hashlib.sha256(
-            f"{tourist_data['id_number']}{datetime.now().isoformat()}{secrets.token_hex(16)}".encode()
-        ).hexdigest()
+        # Encrypt sensitive data: the five random nonces come from a single urandom call
+        nonces = secrets.token_bytes(NONCE_SIZE * 5)
+        nonce = [nonces[i:i + NONCE_SIZE] for i in range(0, len(nonces), NONCE_SIZE)]
         
-        # Encrypt sensitive data
-        name_encrypted = self.encrypt_data(tourist_data['name'])
-        id_number_encrypted = self.encrypt_data(tourist_data['id_number'])
-        phone_encrypted = self.encrypt_data(tourist_data.get('phone', ''))
-        email_encrypted = self.encrypt_data(tourist_data.get('email', ''))
+        name_encrypted = self.encrypt_data(tourist_data['name'], nonce[0])
+        id_number_encrypted = self.encrypt_data(tourist_data['id_number'], nonce[1])
+        phone_encrypted = self.encrypt_data(tourist_data.get('phone', ''), nonce[2])
+        email_encrypted = self.encrypt_data(tourist_data.get('email', ''), nonce[3])
         
         itinerary_json = json.dumps(tourist_data.get('itinerary', []))
-        itinerary_encrypted = self.encrypt_data(itinerary_json)
+        itinerary_encrypted = self.encrypt_data(itinerary_json, nonce[4])
         
-        # Insert into database
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO tourists (
-                did, id_hash, name_encrypted, id_type, id_number_encrypted,
-                phone_encrypted, email_encrypted, entry_point, itinerary_encrypted,
-                encryption_key_id
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        row = (
             tourist_data['did'],
             id_hash,
             name_encrypted,
@@ -136,20 +182,16 @@ class DatabaseManager:
             tourist_data['entry_point'],
             itinerary_encrypted,
             'master_key_v1'
-        ))
-        
-        self.conn.commit()
-        tourist_id = cursor.lastrowid
+        )
         
-        logger.success(f"Tourist registered: DID={tourist_data['did']}, ID={tourist_id}")
-        
-        return tourist_id, id_hash
+        return row, id_hash
     
     def get_tourist_by_did(self, did):
         """Get tourist information by DID (decrypted)"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM tourists WHERE did = ?', (did,))
-        row = cursor.fetchone()
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT * FROM tourists WHERE did = ?', (did,))
+            row = cursor.fetchone()
         
         if not row:
             return None
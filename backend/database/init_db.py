@@ -24,6 +24,7 @@ def init_databases():
         # Initialize MongoDB
         logger.info("Initializing MongoDB...")
         mongo = MongoManager()
+        mongo.create_indexes(force=True)
         logger.success("✅ MongoDB initialized")
         
         # Test connections
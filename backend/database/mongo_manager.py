@@ -2,11 +2,90 @@
 MongoDB Manager for MCPT Feature Bank
 Handles tourist visual features and tracking sessions
 """
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne
+from pymongo.write_concern import WriteConcern
+from bson import Binary
 from datetime import datetime
 import numpy as np
 from loguru import logger
 import os
+import threading
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# Re-ID embeddings are stored as raw float16 bytes: 2 bytes per dimension instead of a
+# BSON array of 8-byte doubles (+ per-element type/key overhead)
+EMBEDDING_DTYPE = np.float16
+
+# Below this many stored features an exact matrix-vector product is as fast as an
+# ANN index (and exact); above it, search goes through a FAISS HNSW graph if installed
+ANN_MIN_FEATURES = 10000
+
+# Tracklet updates are buffered and written with one bulk_write per interval
+# (or as soon as this many are pending) instead of one round-trip each
+TRACKLET_FLUSH_INTERVAL = 0.5
+TRACKLET_FLUSH_MAX = 500
+
+# Marker document in the _meta collection; bump when the index set below changes
+INDEXES_VERSION = 'indexes_v1'
+
+# one pooled client per (process, URI): forked workers must not share sockets,
+# and managers in the same process reuse the connections and SCRAM handshakes.
+# (process, URI) -> [client, managers holding it]; closed when the last one releases
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(connection_string):
+    """
+    Pooled MongoClient for this process (pair every call with _release_client)
+    
+    Wire compression (zstd, else snappy, else zlib - whatever both sides support)
+    shrinks the tracklet arrays, which are large and highly repetitive
+    """
+    key = (os.getpid(), connection_string)
+    with _clients_lock:
+        entry = _clients.get(key)
+        if entry is None:
+            client = MongoClient(
+                connection_string,
+                maxPoolSize=50,
+                minPoolSize=5,
+                compressors='zstd,snappy,zlib',
+                serverSelectionTimeoutMS=5000,
+            )
+            entry = _clients[key] = [client, 0]
+        entry[1] += 1
+        return entry[0]
+
+
+def _release_client(connection_string):
+    """Drop one reference to this process's pooled client; close it when no manager is left"""
+    key = (os.getpid(), connection_string)
+    with _clients_lock:
+        entry = _clients.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        del _clients[key]
+    entry[0].close()
+
+
+def encode_embedding(embedding):
+    """Embedding (array or list) -> BSON binary of float16 values"""
+    return Binary(np.asarray(embedding, dtype=EMBEDDING_DTYPE).ravel().tobytes())
+
+
+def decode_embedding(value):
+    """Stored embedding (float16 bytes, or a legacy list of floats) -> float32 vector"""
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype=EMBEDDING_DTYPE).astype(np.float32)
+    return np.asarray(value, dtype=np.float32)
 
 
 class MongoManager:
@@ -31,25 +110,63 @@ class MongoManager:
                 f"?authSource=admin&authMechanism=SCRAM-SHA-256"
             )
         
+        # L2-normalized Re-ID embeddings of every stored feature as one (N, D) float32
+        # matrix + (did, feature_id, capture_timestamp) per row, rebuilt when the collection changes
+        self._features_matrix = None
+        self._features_meta = []
+        self._features_count = -1
+        self._features_index = None  # FAISS HNSW over the same matrix, large collections only
+        self._features_lock = threading.Lock()
+        
+        # session_id -> tracklets not yet written
+        self._pending_tracklets = {}
+        self._pending_count = 0
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_stop = threading.Event()
+        self._flush_thread = None
+        self.client = None
+        
         try:
-            self.client = MongoClient(connection_string)
+            self.connection_string = connection_string
+            self.client = get_client(connection_string)
             self.db = self.client['tourist_safety']
             
             # Collections
             self.tourist_features = self.db['tourist_features']
             self.tracking_sessions = self.db['tracking_sessions']
+            # hot-path tracklet writes: acknowledged by the primary, no journal wait
+            self._tracklet_writes = self.tracking_sessions.with_options(
+                write_concern=WriteConcern(w=1, j=False))
             
-            # Create indexes
-            self._create_indexes()
+            # Create indexes (once per deployment)
+            self.create_indexes()
+            
+            self._flush_thread = threading.Thread(target=self._flush_loop, name="MongoTrackletFlush", daemon=True)
+            self._flush_thread.start()
             
             logger.success(f"MongoDB connected: {connection_string.split('@')[1] if '@' in connection_string else 'localhost'}")
             
         except Exception as e:
             logger.error(f"MongoDB connection failed: {e}")
+            if self.client is not None:
+                _release_client(connection_string)
+                self.client = None
             raise
     
-    def _create_indexes(self):
-        """Create indexes for performance"""
+    def create_indexes(self, force=False):
+        """
+        Create indexes for performance
+        
+        Args:
+            force: Issue the create_index commands even if this index version
+                was already created (init_db.py does)
+        """
+        meta = self.db['_meta']
+        if not force and meta.find_one({'_id': INDEXES_VERSION}) is not None:
+            # one lookup instead of a create_index round-trip per index
+            return
+        
         # Tourist features indexes
         self.tourist_features.create_index([("feature_id", ASCENDING)], unique=True)
         self.tourist_features.create_index([("did", ASCENDING)])
@@ -63,6 +180,8 @@ class MongoManager:
         self.tracking_sessions.create_index([("status", ASCENDING)])
         self.tracking_sessions.create_index([("start_timestamp", DESCENDING)])
         
+        meta.update_one({'_id': INDEXES_VERSION}, {'$set': {'created_at': datetime.now()}}, upsert=True)
+        
         logger.info("MongoDB indexes created")
     
     def store_tourist_features(self, feature_data):
@@ -82,9 +201,12 @@ class MongoManager:
         Returns:
             inserted_id: MongoDB document ID
         """
-        # Convert numpy array to list for JSON serialization
-        if isinstance(feature_data.get('reid_embedding'), np.ndarray):
-            feature_data['reid_embedding'] = feature_data['reid_embedding'].tolist()
+        # Compact float16 binary (decoded by get_tourist_features / the search matrix)
+        if feature_data.get('reid_embedding') is not None:
+            embedding = feature_data['reid_embedding']
+            feature_data['reid_embedding'] = encode_embedding(embedding)
+            feature_data['reid_embedding_dtype'] = np.dtype(EMBEDDING_DTYPE).name
+            feature_data['reid_embedding_dim'] = int(np.size(embedding))
         
         # Add timestamps
         feature_data['capture_timestamp'] = datetime.now()
@@ -93,6 +215,10 @@ class MongoManager:
         
         result = self.tourist_features.insert_one(feature_data)
         
+        # search matrix is rebuilt on the next query
+        with self._features_lock:
+            self._features_matrix = None
+        
         logger.success(f"Tourist features stored: feature_id={feature_data['feature_id']}, did={feature_data['did']}")
         
         return str(result.inserted_id)
@@ -101,9 +227,11 @@ class MongoManager:
         """Get all stored features for a tourist"""
         features = list(self.tourist_features.find({'did': did}).sort('capture_timestamp', DESCENDING))
         
-        # Convert ObjectId to string
+        # Convert ObjectId to string, embeddings back to plain float lists
         for feature in features:
             feature['_id'] = str(feature['_id'])
+            if feature.get('reid_embedding') is not None:
+                feature['reid_embedding'] = decode_embedding(feature['reid_embedding']).tolist()
         
         return features
     
@@ -150,6 +278,7 @@ class MongoManager:
     def update_tracking_session(self, session_id, tracklet_data):
         """
         Update tracking session with new detection
+        (buffered; written by the next flush(), at most TRACKLET_FLUSH_INTERVAL later)
         
         Args:
             session_id: Session identifier
@@ -158,15 +287,46 @@ class MongoManager:
         # Add timestamp
         tracklet_data['timestamp'] = datetime.now()
         
-        # Update session
-        self.tracking_sessions.update_one(
-            {'session_id': session_id},
-            {
-                '$push': {'tracklets': tracklet_data},
-                '$set': {'last_seen_timestamp': datetime.now()},
-                '$inc': {'total_detections': 1}
-            }
-        )
+        with self._pending_lock:
+            self._pending_tracklets.setdefault(session_id, []).append(tracklet_data)
+            self._pending_count += 1
+            full = self._pending_count >= TRACKLET_FLUSH_MAX
+        
+        if full:
+            self.flush()
+    
+    def flush(self):
+        """Write all buffered tracklets: one UpdateOne per session, one bulk_write in total"""
+        with self._flush_lock:
+            with self._pending_lock:
+                pending = self._pending_tracklets
+                self._pending_tracklets = {}
+                self._pending_count = 0
+            
+            if not pending:
+                return
+            
+            operations = [
+                UpdateOne(
+                    {'session_id': session_id},
+                    {
+                        '$push': {'tracklets': {'$each': tracklets}},
+                        '$set': {'last_seen_timestamp': tracklets[-1]['timestamp']},
+                        '$inc': {'total_detections': len(tracklets)}
+                    }
+                )
+                for session_id, tracklets in pending.items()
+            ]
+            
+            try:
+                self._tracklet_writes.bulk_write(operations, ordered=False)
+            except Exception as e:
+                logger.error(f"Tracklet flush failed ({len(operations)} sessions): {e}")
+    
+    def _flush_loop(self):
+        """Background writer for buffered tracklets"""
+        while not self._flush_stop.wait(TRACKLET_FLUSH_INTERVAL):
+            self.flush()
     
     def end_tracking_session(self, session_id, status='exited'):
         """
@@ -176,6 +336,9 @@ class MongoManager:
             session_id: Session identifier
             status: Final status (exited/lost/transferred)
         """
+        # buffered tracklets belong to the session before it is closed
+        self.flush()
+        
         session = self.tracking_sessions.find_one({'session_id': session_id})
         
         if session:
@@ -218,6 +381,8 @@ class MongoManager:
     
     def get_active_sessions(self, camera_id=None):
         """Get all active tracking sessions"""
+        self.flush()
+        
         query = {'status': 'active'}
         if camera_id:
             query['camera_id'] = camera_id
@@ -230,37 +395,98 @@ class MongoManager:
         
         return sessions
     
-    def get_tourist_trajectory(self, did):
+    def get_tourist_trajectory(self, did, max_tracklets=None):
         """
         Get complete trajectory of a tourist across all cameras
+        (shaped by an aggregation pipeline: only the returned fields leave the server)
         
         Args:
             did: Tourist DID
+            max_tracklets: Keep only the latest N tracklets per session (all if None)
         
         Returns:
             List of tracking sessions with trajectories
         """
-        sessions = list(self.tracking_sessions.find({'did': did}).sort('start_timestamp', ASCENDING))
-        
-        trajectory = []
-        for session in sessions:
-            trajectory.append({
-                'session_id': session['session_id'],
-                'camera_id': session['camera_id'],
-                'tracking_id': session['tracking_id'],
-                'start_time': session['start_timestamp'],
-                'end_time': session.get('end_timestamp'),
-                'duration': session.get('duration_seconds'),
-                'num_detections': session['total_detections'],
-                'tracklets': session['tracklets']
-            })
+        self.flush()
+        
+        tracklets = '$tracklets'
+        if max_tracklets is not None:
+            tracklets = {'$slice': ['$tracklets', -int(max_tracklets)]}
+        
+        pipeline = [
+            {'$match': {'did': did}},
+            {'$sort': {'start_timestamp': ASCENDING}},
+            {'$project': {
+                '_id': 0,
+                'session_id': 1,
+                'camera_id': 1,
+                'tracking_id': 1,
+                'start_time': '$start_timestamp',
+                'end_time': {'$ifNull': ['$end_timestamp', None]},
+                'duration': {'$ifNull': ['$duration_seconds', None]},
+                'num_detections': '$total_detections',
+                'tracklets': tracklets
+            }}
+        ]
+        
+        return list(self.tracking_sessions.aggregate(pipeline))
+    
+    def _feature_matrix(self):
+        """
+        Cached search matrix, reloaded when this process inserted features or the
+        collection's document count changed (e.g. written by another process)
         
-        return trajectory
+        Returns:
+            (matrix, meta, index): (N, D) float32 unit-length embeddings, list of N
+            (did, feature_id, capture_timestamp) tuples, FAISS index or None
+        """
+        count = self.tourist_features.estimated_document_count()
+        
+        with self._features_lock:
+            if self._features_matrix is not None and count == self._features_count:
+                return self._features_matrix, self._features_meta, self._features_index
+        
+        projection = {'_id': 0, 'did': 1, 'feature_id': 1, 'capture_timestamp': 1, 'reid_embedding': 1}
+        rows, meta = [], []
+        dim = None
+        
+        for feature in self.tourist_features.find({}, projection):
+            if feature.get('reid_embedding') is None:
+                continue
+            embedding = decode_embedding(feature['reid_embedding'])
+            if dim is None:
+                dim = len(embedding)
+            if len(embedding) != dim:
+                logger.warning(f"Skipping feature {feature['feature_id']}: embedding dim {len(embedding)} != {dim}")
+                continue
+            rows.append(embedding)
+            meta.append((feature['did'], feature['feature_id'], feature['capture_timestamp']))
+        
+        matrix = np.stack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms > 0, norms, 1)
+        
+        index = None
+        if faiss is not None and len(meta) >= ANN_MIN_FEATURES:
+            # inner product on unit vectors = cosine similarity
+            index = faiss.IndexHNSWFlat(matrix.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efSearch = 64
+            index.add(matrix)
+            logger.info(f"Re-ID ANN index built: {len(meta)} features (HNSW)")
+        
+        with self._features_lock:
+            self._features_matrix = matrix
+            self._features_meta = meta
+            self._features_count = count
+            self._features_index = index
+        
+        return matrix, meta, index
     
     def search_similar_features(self, embedding, threshold=0.7, limit=10):
         """
         Search for similar tourist features using cosine similarity
-        (Simplified version - production would use vector search index)
+        (exact search over a cached normalized matrix - one matrix-vector product per query;
+        FAISS HNSW approximate search once the collection reaches ANN_MIN_FEATURES)
         
         Args:
             embedding: Query embedding (512D vector)
@@ -270,36 +496,56 @@ class MongoManager:
         Returns:
             List of matching tourists with similarity scores
         """
-        # In production, use MongoDB Atlas Vector Search or Milvus
-        # For demo, we'll do basic comparison
+        matrix, meta, index = self._feature_matrix()
+        
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if not meta or norm == 0 or query.shape[0] != matrix.shape[1]:
+            return []
+        query = query / norm
+        
+        if index is not None:
+            # approximate top-k from the HNSW graph, already sorted by similarity
+            scores, ids = index.search(query[None, :], limit)
+            keep = (ids[0] >= 0) & (scores[0] >= threshold)
+            return self._search_results(ids[0][keep], scores[0][keep], meta)
+        
+        # Cosine similarity of every stored feature at once
+        similarities = matrix @ query
+        
+        candidates = np.flatnonzero(similarities >= threshold)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-similarities[candidates], limit - 1)[:limit]]
         
-        all_features = list(self.tourist_features.find({}))
+        # Sort by similarity (stable: ties keep collection order)
+        candidates = candidates[np.argsort(-similarities[candidates], kind='stable')]
+        
+        return self._search_results(candidates, similarities[candidates], meta)
+    
+    @staticmethod
+    def _search_results(rows, scores, meta):
+        """Result dicts for the given matrix rows and their similarities, in order"""
         results = []
+        for i, score in zip(rows, scores):
+            did, feature_id, capture_timestamp = meta[i]
+            results.append({
+                'did': did,
+                'feature_id': feature_id,
+                'similarity': float(score),
+                'capture_timestamp': capture_timestamp
+            })
         
-        for feature in all_features:
-            stored_embedding = np.array(feature['reid_embedding'])
-            query_embedding = np.array(embedding)
-            
-            # Cosine similarity
-            similarity = np.dot(query_embedding, stored_embedding) / (
-                np.linalg.norm(query_embedding) * np.linalg.norm(stored_embedding)
-            )
-            
-            if similarity >= threshold:
-                results.append({
-                    'did': feature['did'],
-                    'feature_id': feature['feature_id'],
-                    'similarity': float(similarity),
-                    'capture_timestamp': feature['capture_timestamp']
-                })
-        
-        # Sort by similarity
-        results.sort(key=lambda x: x['similarity'], reverse=True)
-        
-        return results[:limit]
+        return results
     
     def close(self):
         """Close MongoDB connection"""
+        self._flush_stop.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join(timeout=2.0)
+            self._flush_thread = None
+        
         if self.client:
-            self.client.close()
+            self.flush()
+            _release_client(self.connection_string)
+            self.client = None
             logger.info("MongoDB connection closed")
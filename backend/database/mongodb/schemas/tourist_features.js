@@ -7,7 +7,8 @@ const touristFeaturesSchema = {
   validator: {
     $jsonSchema: {
       bsonType: "object",
-      required: ["feature_id", "did", "capture_timestamp", "reid_embedding"],
+      required: ["feature_id", "did", "capture_timestamp", "reid_embedding",
+                 "reid_embedding_dtype", "reid_embedding_dim"],
       properties: {
         feature_id: {
           bsonType: "string",
@@ -20,11 +21,18 @@ const touristFeaturesSchema = {
         
         // Re-ID Features (for cross-camera matching)
         reid_embedding: {
-          bsonType: "array",
-          description: "512-dimensional Re-ID feature vector from OSNet",
-          items: { bsonType: "double" },
-          minItems: 512,
-          maxItems: 512
+          bsonType: "binData",
+          description: "512-dimensional Re-ID feature vector from OSNet, packed little-endian float16 (1024 bytes)"
+        },
+        reid_embedding_dtype: {
+          enum: ["float16"],
+          description: "numpy dtype of the packed reid_embedding values"
+        },
+        reid_embedding_dim: {
+          bsonType: "int",
+          minimum: 512,
+          maximum: 512,
+          description: "Number of values in reid_embedding"
         },
         
         // Pose Features (from HRNet)
@@ -1,10 +1,101 @@
 """
 Database utility functions
 """
+import functools
 import hashlib
-import secrets
-from datetime import datetime
-import uuid
+import os
+import threading
+import time
+
+# hashlib.sha256 is OpenSSL's EVP SHA-256 (_hashlib.openssl_sha256) on standard CPython
+# builds, which dispatches to SHA-NI / AVX2 at runtime; bound once for the hash helpers
+_sha256 = hashlib.sha256
+
+
+class _RandPool:
+    """
+    os.urandom read in 4 KiB blocks and handed out in slices
+    
+    Every byte is given out once; the block is dropped in a forked child so parent
+    and child never share bytes (os.register_at_fork)
+    """
+    
+    def __init__(self, size=4096):
+        self.size = size
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        self.buf = b''
+        self.off = 0
+    
+    def take(self, n):
+        """Return n fresh random bytes"""
+        if n > self.size:
+            return os.urandom(n)
+        with self.lock:
+            if self.off + n > len(self.buf):
+                self.buf = os.urandom(self.size)
+                self.off = 0
+            chunk = self.buf[self.off:self.off + n]
+            self.off += n
+        return chunk
+
+
+class _CounterIds:
+    """
+    12-hex-char IDs: 8 random hex chars per block, then a 4-hex-char counter within the block
+    
+    A block of 65536 IDs costs one random read. Two IDs only collide if two blocks draw the same
+    32-bit head, which is far less likely than a clash between fully random 48-bit IDs
+    """
+    
+    BLOCK = 0x10000
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        self.head = ''
+        self.n = self.BLOCK
+    
+    def next(self):
+        """Return the next ID"""
+        with self.lock:
+            if self.n == self.BLOCK:
+                self.head = _POOL.take(4).hex()
+                self.n = 0
+            head, n = self.head, self.n
+            self.n += 1
+        return head + '%04x' % n
+
+
+_POOL = _RandPool()
+_FEATURE_IDS = _CounterIds()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_POOL.reset)
+    os.register_at_fork(after_in_child=_FEATURE_IDS.reset)
+
+# (epoch second, '%Y%m%d%H%M%S' local time) of the last session ID; swapped as one tuple
+_session_ts = (None, '')
+
+
+def _session_timestamp():
+    """Local-time '%Y%m%d%H%M%S' for the current second, formatted once per second"""
+    global _session_ts
+    now = int(time.time())
+    cached_s, cached = _session_ts
+    if now == cached_s:
+        return cached
+    t = time.localtime(now)
+    stamp = f"{t.tm_year:04d}{t.tm_mon:02d}{t.tm_mday:02d}{t.tm_hour:02d}{t.tm_min:02d}{t.tm_sec:02d}"
+    _session_ts = (now, stamp)
+    return stamp
+
+
+# "did:<prefix>:" heads, built once per DID method prefix
+_DID_PREFIX = {'tourist': 'did:tourist:'}
 
 
 def generate_did(prefix='tourist'):
@@ -12,24 +103,36 @@ def generate_did(prefix='tourist'):
     Generate Decentralized Identifier (DID)
     Format: did:tourist:12345678
     """
-    random_id = secrets.token_hex(4)
-    return f"did:{prefix}:{random_id}"
+    head = _DID_PREFIX.get(prefix)
+    if head is None:
+        head = _DID_PREFIX.setdefault(prefix, f"did:{prefix}:")
+    return head + _POOL.take(4).hex()
 
 
 def generate_feature_id():
-    """Generate unique feature ID"""
-    return f"feat_{uuid.uuid4().hex[:12]}"
+    """Generate unique feature ID (12 hex chars: random block head + counter)"""
+    return "feat_" + _FEATURE_IDS.next()
+
+
+@functools.lru_cache(maxsize=4096)
+def _session_prefix(camera_id, tracking_id):
+    """'session_<camera>_<track>_', built once per (camera, track) pair"""
+    return f"session_{camera_id}_{tracking_id}_"
 
 
 def generate_session_id(camera_id, tracking_id):
     """Generate tracking session ID"""
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    return f"session_{camera_id}_{tracking_id}_{timestamp}"
+    return _session_prefix(camera_id, tracking_id) + _session_timestamp()
 
 
 def generate_incident_id():
-    """Generate unique incident ID"""
-    return f"incident_{uuid.uuid4().hex[:12]}"
+    """Generate unique incident ID (12 random hex chars)"""
+    return "incident_" + _POOL.take(6).hex()
+
+
+def _salt_bytes(salt):
+    """Bytes a salt contributes to the hash: str salts as UTF-8, bytes salts as given"""
+    return salt if isinstance(salt, bytes) else salt.encode('utf-8')
 
 
 def compute_id_hash(id_number, salt=None):
@@ -37,16 +140,22 @@ def compute_id_hash(id_number, salt=None):
     Compute SHA256 hash of ID number
     
     Args:
-        id_number: Aadhaar/Passport number
-        salt: Optional salt (generated if not provided)
+        id_number: Aadhaar/Passport number (str, or already UTF-8 encoded bytes)
+        salt: Optional salt, hex str or the bytes to hash as-is (hex str generated if not provided)
     
     Returns:
         (hash_hex, salt)
     """
     if salt is None:
-        salt = secrets.token_hex(16)
+        salt = _POOL.take(16).hex()
+    
+    if not isinstance(id_number, bytes):
+        id_number = str(id_number).encode('utf-8')
     
-    hash_input = f"{id_number}{salt}".encode('utf-8')
-    hash_hex = hashlib.sha256(hash_input).hexdigest()
+    # two update() calls hash the same bytes as sha256(id + salt), without building the concatenation.
+    # A 12-digit Aadhaar or <=9-char passport number plus the 32-char salt is at most 44 bytes,
+    # under the 55-byte single-block limit, so OpenSSL already runs exactly one compression
+    h = _sha256(id_number)
+    h.update(_salt_bytes(salt))
     
-    return hash_hex, salt
+    return h.hexdigest(), salt